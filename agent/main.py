@@ -18,30 +18,87 @@ import os
 import sys
 import json
 import time
+import asyncio
 import subprocess
+import select
+import selectors
+import signal
+import shutil
 import re
+import stat
+import mmap
 import shlex
-from datetime import datetime
-from pathlib import Path
-from typing import Optional, List, Dict, Any, Tuple
+import heapq
+import random
+import hashlib
+import importlib.util
+import atexit
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Optional, List, Dict, Any, Tuple
 from dataclasses import dataclass, field
 from abc import ABC, abstractmethod
 import traceback
 
-# Try to import openai client
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletion
+
+_openai = None
+
+
+def _openai_sdk():
+    """The openai package, imported on first use (installed if missing).
+    
+    It is the slowest import by far; deferring it keeps startup fast for
+    runs that fail or finish before the first LLM request.
+    """
+    global _openai
+    if _openai is None:
+        try:
+            import openai
+        except ImportError:
+            print("Installing openai package...")
+            subprocess.run([sys.executable, "-m", "pip", "install", "openai"], check=True)
+            import openai
+        import openai.types.chat
+        _openai = openai
+    return _openai
+
+
+def _chat_completion(data: Dict) -> "ChatCompletion":
+    """Build a ChatCompletion from response JSON without validating it.
+    
+    Matches the SDK's own response parsing: OpenAI-compatible backends may
+    send values (e.g. finish_reason "eos") outside the declared Literals.
+    """
+    return _openai_sdk().types.chat.ChatCompletion.construct(**data)
+
+# Optional: faster JSON for tool arguments and cache keys
 try:
-    from openai import OpenAI
+    import orjson
 except ImportError:
-    print("Installing openai package...")
-    subprocess.run([sys.executable, "-m", "pip", "install", "openai"], check=True)
-    from openai import OpenAI
+    orjson = None
+
+
+def _json_loads(data):
+    """Parse JSON with orjson when available; errors are json.JSONDecodeError."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _json_dumps_sorted(obj) -> bytes:
+    """Canonical (key-sorted) UTF-8 JSON, used for hashing."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, sort_keys=True).encode("utf-8")
 
 
 # ============================================================================
 # Configuration
 # ============================================================================
 
-@dataclass
+@dataclass(slots=True)
 class AgentConfig:
     """Agent configuration loaded from task_config.json."""
     task_id: str
@@ -55,6 +112,20 @@ class AgentConfig:
     max_iterations: int = 50
     max_file_size: int = 1024 * 1024  # 1MB
     command_timeout: int = 300  # 5 minutes
+    max_list_entries: int = 2000  # list_files output cap
+    stream: bool = True  # stream completions and start read-only tools early
+    cache_enabled: bool = False  # replay identical LLM requests from disk
+    cache_dir: str = "~/.cache/scree/llm"
+    max_context_tokens: int = 60000  # summarize older turns beyond this
+    context_window: int = 128000  # model's total token limit (prompt + output)
+    keep_recent_messages: int = 10  # always sent verbatim
+    summary_model: str = ""  # model for history summaries (default: model)
+    max_retries: int = 5  # LLM request retries on transient errors
+    shallow_clone: bool = True  # clone only the branch tip, without history
+    batch_mode: bool = False  # send completions through the Batch API (unattended runs)
+    batch_poll_interval: int = 30  # seconds between batch status checks
+    heuristic_shortcuts: bool = False  # finish without an LLM turn when the intent is clear
+    progress_serial_device: str = ""  # Serial port mirrored with progress lines
     
     @classmethod
     def load(cls, config_path: str = "/opt/agent/task_config.json") -> "AgentConfig":
@@ -72,7 +143,21 @@ class AgentConfig:
             workspace_dir=data.get("workspace_dir", "/home/agent/workspace"),
             max_iterations=data.get("max_iterations", 50),
             max_file_size=data.get("max_file_size", 1024 * 1024),
-            command_timeout=data.get("command_timeout", 300)
+            command_timeout=data.get("command_timeout", 300),
+            max_list_entries=data.get("max_list_entries", 2000),
+            stream=data.get("stream", True),
+            cache_enabled=data.get("cache_enabled", False),
+            cache_dir=data.get("cache_dir", "~/.cache/scree/llm"),
+            max_context_tokens=data.get("max_context_tokens", 60000),
+            context_window=data.get("context_window", 128000),
+            keep_recent_messages=data.get("keep_recent_messages", 10),
+            summary_model=data.get("summary_model", ""),
+            max_retries=data.get("max_retries", 5),
+            shallow_clone=data.get("shallow_clone", True),
+            batch_mode=data.get("batch_mode", False),
+            batch_poll_interval=data.get("batch_poll_interval", 30),
+            heuristic_shortcuts=data.get("heuristic_shortcuts", False),
+            progress_serial_device=data.get("progress_serial_device", "")
         )
 
 
@@ -81,24 +166,135 @@ class AgentConfig:
 # ============================================================================
 
 class ProgressLogger:
-    """Logs progress to a file for the orchestrator to stream."""
+    """Logs progress to a file for the orchestrator to stream.
+    
+    Lines are handed to a writer thread that coalesces whatever has queued
+    up into one writev() per destination, keeping syscalls off the agent loop.
+    """
+    
+    MAX_BATCH = 256  # lines per writev, well under IOV_MAX
+    SERIAL_WRITE_TIMEOUT = 1.0  # seconds to finish a line cut by a short serial write
     
     def __init__(self, log_path: str = "/opt/agent/progress.log"):
         self.log_path = log_path
+        self._serial_fd: Optional[int] = None
+        # A cut serial line could not be finished; start the next write on a new line
+        self._serial_broken = False
+        # (epoch second, formatted HH:MM:SS); one tuple so threads swap it atomically
+        self._ts_cache: Tuple[int, str] = (-1, "")
         self._ensure_dir()
+        # Kept open for the agent's lifetime; written unbuffered because the
+        # orchestrator tails this file while we run
+        self._fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._q: queue.SimpleQueue = queue.SimpleQueue()
+        threading.Thread(target=self._drain, name="progress-log", daemon=True).start()
+        atexit.register(self.flush)
     
     def _ensure_dir(self):
-        Path(self.log_path).parent.mkdir(parents=True, exist_ok=True)
+        # The directory normally exists already; only mkdir on a miss
+        log_dir = os.path.dirname(self.log_path)
+        if log_dir and not os.path.isdir(log_dir):
+            os.makedirs(log_dir, exist_ok=True)
+    
+    def attach_serial(self, device: str):
+        """Mirror log lines to a serial port the orchestrator reads as a push stream."""
+        try:
+            self._serial_fd = os.open(device, os.O_WRONLY | os.O_NOCTTY | os.O_NONBLOCK)
+        except OSError as e:
+            self.log(f"Serial progress unavailable ({device}): {e}", "INFO")
     
     def _timestamp(self) -> str:
-        return datetime.now().strftime("%H:%M:%S")
+        # Bursts of lines share one strftime per second
+        now = int(time.time())
+        sec, ts = self._ts_cache
+        if now != sec:
+            ts = time.strftime("%H:%M:%S", time.localtime(now))
+            self._ts_cache = (now, ts)
+        return ts
     
     def log(self, message: str, level: str = "INFO"):
         """Log a message with timestamp."""
-        line = f"[{self._timestamp()}] [{level}] {message}"
-        print(line)
-        with open(self.log_path, "a") as f:
-            f.write(line + "\n")
+        line = f"[{self._timestamp()}] [{level}] {message}\n"
+        self._q.put(line.encode("utf-8"))
+    
+    def flush(self):
+        """Block until every line logged so far has been written."""
+        done = threading.Event()
+        self._q.put(done)
+        done.wait(timeout=5)
+    
+    def _drain(self):
+        """Writer thread: batch queued lines into one write per destination."""
+        while True:
+            batch: List[bytes] = []
+            waiters: List[threading.Event] = []
+            item = self._q.get()
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= self.MAX_BATCH:
+                    break
+                try:
+                    item = self._q.get_nowait()
+                except queue.Empty:
+                    break
+            
+            try:
+                if batch:
+                    self._write_all(self._fd, batch)
+                    try:
+                        self._write_all(sys.stdout.fileno(), batch)
+                    except (OSError, ValueError):
+                        pass
+                    if self._serial_fd is not None:
+                        try:
+                            self._write_serial(batch)
+                        except OSError:
+                            # progress.log remains the source of truth; drop the push copy
+                            pass
+            except Exception as e:
+                # Keep the thread alive so later lines (and flush()) still work
+                print(f"progress log write failed: {e}", file=sys.stderr)
+            finally:
+                for done in waiters:
+                    done.set()
+    
+    def _write_serial(self, bufs: List[bytes]):
+        """Write whole lines to the non-blocking serial port, dropping what does not fit.
+        
+        A line cut by a short write is finished (waiting briefly for the port)
+        so it cannot run into the next batch; the lines after it are dropped.
+        """
+        if self._serial_broken:
+            bufs = [b"\n", *bufs]
+        written = os.writev(self._serial_fd, bufs)
+        self._serial_broken = False
+        data = b"".join(bufs)
+        if written == len(data) or data[written - 1:written] == b"\n":
+            return
+        rest = memoryview(data)[written:data.index(b"\n", written) + 1]
+        self._serial_broken = True
+        deadline = time.monotonic() + self.SERIAL_WRITE_TIMEOUT
+        while rest:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or not select.select([], [self._serial_fd], [], timeout)[1]:
+                return
+            try:
+                rest = rest[os.write(self._serial_fd, rest):]
+            except BlockingIOError:
+                continue
+        self._serial_broken = False
+    
+    @staticmethod
+    def _write_all(fd: int, bufs: List[bytes]):
+        written = os.writev(fd, bufs)
+        if written < sum(map(len, bufs)):
+            # Short write (e.g. a full pipe): finish the remainder byte-wise
+            rest = memoryview(b"".join(bufs))[written:]
+            while rest:
+                rest = rest[os.write(fd, rest):]
     
     def info(self, message: str):
         self.log(message, "INFO")
@@ -112,10 +308,9 @@ class ProgressLogger:
     
     def thinking(self, thought: str):
         """Log agent's thinking."""
-        # Truncate long thoughts
-        if len(thought) > 200:
-            thought = thought[:200] + "..."
-        self.log(f"💭 {thought}", "THINK")
+        # Truncate long thoughts to 200 characters including the ellipsis
+        msg = thought[:197] + "..." if len(thought) > 200 else thought
+        self.log(f"💭 {msg}", "THINK")
     
     def success(self, message: str):
         self.log(f"✅ {message}", "SUCCESS")
@@ -126,70 +321,291 @@ class ProgressLogger:
     def complete(self, summary: str = ""):
         """Mark task as complete."""
         self.log(f"[TASK_COMPLETE] {summary}", "DONE")
+        self.flush()
     
     def fail(self, error: str):
         """Mark task as failed."""
         self.log(f"[TASK_FAILED] {error}", "FAIL")
+        self.flush()
 
 
 # ============================================================================
 # Tools
 # ============================================================================
 
+def _write_bytes(path: str, data: bytes):
+    """Write pre-encoded bytes straight to an fd, bypassing the text I/O layers."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
+def _run_capped(
+    cmd, limit: int, timeout: float, **popen_kwargs
+) -> Tuple[int, str, str, bool]:
+    """Run a command, keeping at most limit bytes of combined output.
+    
+    Both pipes are drained together; if the output outgrows the cap, the
+    whole process group is killed rather than buffering it all. Returns
+    (returncode, stdout, stderr, truncated). Raises TimeoutExpired like
+    subprocess.run.
+    """
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+        **popen_kwargs
+    )
+    out, err = bytearray(), bytearray()
+    bufs = {proc.stdout.fileno(): out, proc.stderr.fileno(): err}
+    deadline = time.monotonic() + timeout
+    truncated = False
+    
+    def kill():
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    
+    try:
+        with selectors.DefaultSelector() as sel:
+            for fd in bufs:
+                sel.register(fd, selectors.EVENT_READ)
+            while sel.get_map() and not truncated:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    kill()
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+                for key, _ in sel.select(remaining):
+                    chunk = os.read(key.fd, 65536)
+                    if not chunk:
+                        sel.unregister(key.fd)
+                        continue
+                    buf = bufs[key.fd]
+                    buf += chunk
+                    overflow = len(out) + len(err) - limit
+                    if overflow > 0:
+                        del buf[len(buf) - overflow:]
+                        truncated = True
+                        kill()
+                        break
+        try:
+            returncode = proc.wait(timeout=max(deadline - time.monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            kill()
+            raise subprocess.TimeoutExpired(cmd, timeout)
+    finally:
+        proc.stdout.close()
+        proc.stderr.close()
+        if proc.returncode is None:
+            proc.wait()
+    
+    return (
+        returncode,
+        out.decode("utf-8", "replace"),
+        err.decode("utf-8", "replace"),
+        truncated
+    )
+
+
 class Tool(ABC):
     """Base class for agent tools."""
     
     name: str
     description: str
     
+    # Results beyond MAX_RESULT_CHARS keep their head and tail; line-oriented
+    # tools set HEAD_LINES/TAIL_LINES to cut on line boundaries instead.
+    MAX_RESULT_CHARS = 8000
+    HEAD_LINES: Optional[int] = None
+    TAIL_LINES: Optional[int] = None
+    
     @abstractmethod
     def execute(self, **kwargs) -> str:
         """Execute the tool and return result."""
         pass
     
-    @abstractmethod
+    def truncate(self, result: str) -> str:
+        """Shorten a result before it enters the message history."""
+        if len(result) <= self.MAX_RESULT_CHARS:
+            return result
+        if self.HEAD_LINES is not None:
+            lines = result.splitlines()
+            omitted = len(lines) - self.HEAD_LINES - self.TAIL_LINES
+            if omitted > 0:
+                result = "\n".join(
+                    lines[:self.HEAD_LINES]
+                    + [f"... ({omitted} lines truncated) ..."]
+                    + lines[-self.TAIL_LINES:]
+                )
+                if len(result) <= self.MAX_RESULT_CHARS:
+                    return result
+        half = self.MAX_RESULT_CHARS // 2
+        omitted = len(result) - 2 * half
+        return f"{result[:half]}\n... ({omitted} chars truncated) ...\n{result[-half:]}"
+    
+    async def execute_async(self, **kwargs) -> str:
+        """Execute without blocking the event loop (worker thread by default)."""
+        return await asyncio.to_thread(self.execute, **kwargs)
+    
     def get_schema(self) -> dict:
-        """Get OpenAI function schema for this tool."""
+        """Get OpenAI function schema for this tool (built once per class).
+        
+        The returned dict is shared; callers must not mutate it.
+        """
+        cls = type(self)
+        schema = cls.__dict__.get("_schema")
+        if schema is None:
+            schema = cls._schema = self._build_schema()
+        return schema
+    
+    @abstractmethod
+    def _build_schema(self) -> dict:
+        """Build the OpenAI function schema; must depend only on class attributes."""
         pass
 
 
-class ReadFileTool(Tool):
-    name = "read_file"
-    description = "Read the contents of a file"
+class _WorkspaceTool(Tool):
+    """Base for tools confined to the workspace; resolves it once."""
     
     def __init__(self, config: AgentConfig, logger: ProgressLogger):
         self.config = config
         self.logger = logger
+        self._ws = os.path.realpath(config.workspace_dir)
+        # Containment is "equal to, or under, ws + /", never a bare prefix
+        self._ws_prefix = self._ws + os.sep
     
-    def execute(self, path: str) -> str:
-        self.logger.action("Reading file", path)
+    def _within(self, path: str) -> bool:
+        return path == self._ws or path.startswith(self._ws_prefix)
+    
+    def _safe_join(self, rel: str) -> Optional[str]:
+        """Join rel onto the workspace, or None if it escapes.
         
-        full_path = self._resolve_path(path)
+        The lexical check rejects '..' escapes without touching the filesystem;
+        the candidate is then resolved once so symlinks cannot point outside.
+        """
+        path = os.path.normpath(os.path.join(self._ws, rel))
+        if not self._within(path):
+            return None
+        path = os.path.realpath(path)
+        return path if self._within(path) else None
+
+
+class ReadFileTool(_WorkspaceTool):
+    name = "read_file"
+    description = "Read the contents of a file"
+    
+    MMAP_THRESHOLD = 64 * 1024  # below this, mmap setup costs more than it saves
+    MAX_LINES = 2000  # per paged read
+    HEAD_LINES = 80
+    TAIL_LINES = 40
+    TRUNCATION_HINT = "(Use offset/limit to read the omitted lines.)"
+    
+    def execute(self, path: str, offset: int = 1, limit: Optional[int] = None) -> str:
+        self.logger.action("Reading file", path)
+        if limit is not None and limit < 1:
+            return f"Error: limit must be at least 1 (got {limit})"
+        if offset <= 1 and limit is None:
+            return self._read(path)
+        return self._read_lines(path, max(offset, 1), min(limit or self.MAX_LINES, self.MAX_LINES))
+    
+    def truncate(self, result: str) -> str:
+        shortened = super().truncate(result)
+        if shortened is not result:
+            shortened += "\n" + self.TRUNCATION_HINT
+        return shortened
+    
+    def _stat(self, path: str):
+        """(full_path, stat_result) for a readable regular file, or an error string."""
+        full_path = self._safe_join(path)
         if not full_path:
             return f"Error: Path '{path}' is outside workspace"
         
-        if not os.path.exists(full_path):
+        try:
+            st = os.stat(full_path)
+        except FileNotFoundError:
             return f"Error: File '{path}' does not exist"
+        except OSError as e:
+            return f"Error reading file: {e}"
+        
+        if not stat.S_ISREG(st.st_mode):
+            return f"Error: '{path}' is not a regular file"
+        return full_path, st
+    
+    def _read(self, path: str) -> str:
+        checked = self._stat(path)
+        if isinstance(checked, str):
+            return checked
+        full_path, st = checked
         
-        if os.path.getsize(full_path) > self.config.max_file_size:
-            return f"Error: File too large (max {self.config.max_file_size} bytes)"
+        if st.st_size > self.config.max_file_size:
+            return (
+                f"Error: File too large (max {self.config.max_file_size} bytes); "
+                "read it in parts with offset/limit"
+            )
         
         try:
+            if st.st_size > self.MMAP_THRESHOLD:
+                # Decode straight from the page cache, skipping the read() copy.
+                # CR line endings need text mode's newline translation instead.
+                with open(full_path, "rb") as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if mm.find(b"\r") == -1:
+                        return str(mm, "utf-8", "replace")
             with open(full_path, "r", encoding="utf-8", errors="replace") as f:
-                content = f.read()
-            return content
+                return f.read()
         except Exception as e:
             return f"Error reading file: {e}"
     
-    def _resolve_path(self, path: str) -> Optional[str]:
-        """Resolve path and ensure it's within workspace."""
-        workspace = os.path.realpath(self.config.workspace_dir)
-        full_path = os.path.realpath(os.path.join(workspace, path))
-        if full_path.startswith(workspace):
-            return full_path
-        return None
+    def _read_lines(self, path: str, offset: int, limit: int) -> str:
+        """Lines offset..offset+limit-1 (1-based), decoding only that slice.
+        
+        Not bound by max_file_size: only the requested lines are materialized.
+        The page also stops early once it would outgrow MAX_RESULT_CHARS, so
+        truncate() never cuts lines out of it unannounced.
+        """
+        checked = self._stat(path)
+        if isinstance(checked, str):
+            return checked
+        full_path, st = checked
+        if st.st_size == 0:
+            return "" if offset == 1 else f"Error: '{path}' has fewer than {offset} lines"
+        
+        try:
+            with open(full_path, "rb") as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start = 0
+                for _ in range(offset - 1):
+                    start = mm.find(b"\n", start) + 1
+                    if not start or start == len(mm):
+                        return f"Error: '{path}' has fewer than {offset} lines"
+                # UTF-8 bytes bound the decoded length; leave room for the note
+                budget = start + self.MAX_RESULT_CHARS - 100
+                end = start
+                count = 0
+                while count < limit and end < len(mm):
+                    line_end = mm.find(b"\n", end) + 1 or len(mm)
+                    if count and line_end > budget:
+                        break
+                    end = line_end
+                    count += 1
+                text = str(mm[start:end], "utf-8", "replace")
+                more = end < len(mm)
+        except Exception as e:
+            return f"Error reading file: {e}"
+        
+        text = text.replace("\r\n", "\n")
+        if more:
+            text += f"(more lines follow; continue with offset={offset + count})"
+        return text
     
-    def get_schema(self) -> dict:
+    def _build_schema(self) -> dict:
         return {
             "type": "function",
             "function": {
@@ -201,6 +617,15 @@ class ReadFileTool(Tool):
                         "path": {
                             "type": "string",
                             "description": "Relative path to the file within the workspace"
+                        },
+                        "offset": {
+                            "type": "integer",
+                            "description": "First line to read (1-based)",
+                            "default": 1
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": f"Number of lines to read (max {self.MAX_LINES}); use to page through large files"
                         }
                     },
                     "required": ["path"]
@@ -209,35 +634,96 @@ class ReadFileTool(Tool):
         }
 
 
-class WriteFileTool(Tool):
+class BatchReadFileTool(ReadFileTool):
+    name = "read_files"
+    description = "Read the contents of several files at once"
+    
+    MAX_FILES = 20
+    MAX_WORKERS = 8
+    # Several files in one result: a line cut would hide the middle ones
+    MAX_RESULT_CHARS = 16000
+    HEAD_LINES = None
+    TRUNCATION_HINT = "(Use read_file with offset/limit to read the omitted part of a file.)"
+    
+    def execute(self, paths: List[str]) -> str:
+        if not isinstance(paths, list):
+            return "Error: paths must be a list of file paths"
+        if not paths:
+            return "Error: No paths given"
+        paths = paths[:self.MAX_FILES]
+        self.logger.action("Reading files", ", ".join(paths))
+        
+        # Reads overlap in worker threads (file I/O releases the GIL)
+        with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, len(paths))) as pool:
+            contents = list(pool.map(self._read, paths))
+        
+        return "\n\n".join(
+            f"=== {path} ===\n{content}" for path, content in zip(paths, contents)
+        )
+    
+    def _build_schema(self) -> dict:
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": f"{self.description} (up to {self.MAX_FILES} files)",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "paths": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Relative paths of the files within the workspace"
+                        }
+                    },
+                    "required": ["paths"]
+                }
+            }
+        }
+
+
+class WriteFileTool(_WorkspaceTool):
     name = "write_file"
     description = "Write content to a file (creates directories if needed)"
     
+    MAX_KNOWN_DIRS = 256
+    
     def __init__(self, config: AgentConfig, logger: ProgressLogger):
-        self.config = config
-        self.logger = logger
+        super().__init__(config, logger)
+        # Parent directories already created/seen, to skip repeat makedirs calls
+        self._known_dirs: set = set()
     
     def execute(self, path: str, content: str) -> str:
         self.logger.action("Writing file", path)
         
-        workspace = os.path.realpath(self.config.workspace_dir)
-        full_path = os.path.realpath(os.path.join(workspace, path))
-        
-        if not full_path.startswith(workspace):
+        full_path = self._safe_join(path)
+        if not full_path:
             return f"Error: Path '{path}' is outside workspace"
         
         try:
-            # Create parent directories
-            os.makedirs(os.path.dirname(full_path), exist_ok=True)
-            
-            with open(full_path, "w", encoding="utf-8") as f:
-                f.write(content)
+            data = content.encode("utf-8")
+            parent = os.path.dirname(full_path)
+            if parent not in self._known_dirs:
+                self._make_parent(parent)
+            try:
+                _write_bytes(full_path, data)
+            except FileNotFoundError:
+                # Directory removed behind our back (e.g. by a command); recreate
+                self._make_parent(parent)
+                _write_bytes(full_path, data)
             
-            return f"Successfully wrote {len(content)} bytes to {path}"
+            return f"Successfully wrote {len(data)} bytes to {path}"
         except Exception as e:
             return f"Error writing file: {e}"
     
-    def get_schema(self) -> dict:
+    def _make_parent(self, parent: str):
+        os.makedirs(parent, exist_ok=True)
+        if len(self._known_dirs) >= self.MAX_KNOWN_DIRS:
+            self._known_dirs.clear()
+        self._known_dirs.add(parent)
+
+    
+    def _build_schema(self) -> dict:
         return {
             "type": "function",
             "function": {
@@ -261,56 +747,76 @@ class WriteFileTool(Tool):
         }
 
 
-class ListFilesTool(Tool):
+class ListFilesTool(_WorkspaceTool):
     name = "list_files"
     description = "List files and directories in a path"
     
-    def __init__(self, config: AgentConfig, logger: ProgressLogger):
-        self.config = config
-        self.logger = logger
+    HEAD_LINES = 80
+    TAIL_LINES = 40
     
     def execute(self, path: str = ".", recursive: bool = False) -> str:
         self.logger.action("Listing files", path)
         
-        workspace = os.path.realpath(self.config.workspace_dir)
-        full_path = os.path.realpath(os.path.join(workspace, path))
-        
-        if not full_path.startswith(workspace):
+        full_path = self._safe_join(path)
+        if not full_path:
             return f"Error: Path '{path}' is outside workspace"
         
         if not os.path.exists(full_path):
             return f"Error: Path '{path}' does not exist"
+        if not os.path.isdir(full_path):
+            return f"Error: Path '{path}' is not a directory"
         
         try:
             if recursive:
+                # Explicit scandir walk: dirent types answer is_dir() without
+                # an extra stat, and paths are made relative by slicing
+                prefix_len = len(self._ws_prefix)
                 files = []
-                for root, dirs, filenames in os.walk(full_path):
-                    # Skip hidden directories
-                    dirs[:] = [d for d in dirs if not d.startswith('.')]
-                    
-                    for filename in filenames:
-                        if not filename.startswith('.'):
-                            rel_path = os.path.relpath(
-                                os.path.join(root, filename),
-                                workspace
-                            )
-                            files.append(rel_path)
-                return "\n".join(sorted(files))
+                stack = [full_path]
+                while stack:
+                    directory = stack.pop()
+                    try:
+                        it = os.scandir(directory)
+                    except OSError:
+                        # Like os.walk, skip subdirectories that can't be read
+                        if directory == full_path:
+                            raise
+                        continue
+                    with it:
+                        for entry in it:
+                            # Skip hidden files and directories
+                            if entry.name.startswith('.'):
+                                continue
+                            if entry.is_dir():
+                                # Like os.walk, don't descend into symlinked dirs
+                                if not entry.is_symlink():
+                                    stack.append(entry.path)
+                            else:
+                                files.append(entry.path[prefix_len:])
+                return self._format_listing(files)
             else:
                 entries = []
-                for entry in os.listdir(full_path):
-                    if entry.startswith('.'):
-                        continue
-                    entry_path = os.path.join(full_path, entry)
-                    if os.path.isdir(entry_path):
-                        entries.append(f"{entry}/")
-                    else:
-                        entries.append(entry)
-                return "\n".join(sorted(entries))
+                with os.scandir(full_path) as it:
+                    for entry in it:
+                        if entry.name.startswith('.'):
+                            continue
+                        if entry.is_dir():
+                            entries.append(f"{entry.name}/")
+                        else:
+                            entries.append(entry.name)
+                return self._format_listing(entries)
         except Exception as e:
             return f"Error listing files: {e}"
     
-    def get_schema(self) -> dict:
+    def _format_listing(self, names: List[str]) -> str:
+        """Sorted listing capped at max_list_entries; a partial sort skips the tail."""
+        limit = self.config.max_list_entries
+        if len(names) <= limit:
+            return "\n".join(sorted(names))
+        shown = heapq.nsmallest(limit, names)
+        return "\n".join(shown) + f"\n... ({len(names) - limit} more)"
+    
+    def _build_schema(self) -> dict:
         return {
             "type": "function",
             "function": {
@@ -336,52 +842,64 @@ class ListFilesTool(Tool):
         }
 
 
-class SearchFilesTool(Tool):
+class SearchFilesTool(_WorkspaceTool):
     name = "search_files"
     description = "Search for a pattern in files using grep"
     
+    MAX_OUTPUT = 64 * 1024  # bytes of matches kept; the LLM only sees a slice anyway
+    MAX_COLUMNS = 300  # longer matching lines (minified files) are previewed
+    HEAD_LINES = 80
+    TAIL_LINES = 40
+    
     def __init__(self, config: AgentConfig, logger: ProgressLogger):
-        self.config = config
-        self.logger = logger
+        super().__init__(config, logger)
+        # ripgrep is much faster on large trees; grep is the fallback
+        self._rg = shutil.which("rg")
     
     def execute(self, pattern: str, path: str = ".", file_pattern: str = "*") -> str:
         self.logger.action("Searching files", f"'{pattern}' in {path}")
         
-        workspace = os.path.realpath(self.config.workspace_dir)
-        full_path = os.path.realpath(os.path.join(workspace, path))
-        
-        if not full_path.startswith(workspace):
+        full_path = self._safe_join(path)
+        if not full_path:
             return f"Error: Path '{path}' is outside workspace"
         
         try:
-            # Use grep for searching
-            cmd = [
-                "grep", "-r", "-n", "-I",
-                "--include", file_pattern,
-                pattern, full_path
-            ]
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=60
+            # Run from the workspace so reported paths are already relative
+            if self._rg:
+                # Like grep -r: include hidden and ignored files, but not .git
+                # (later globs win in rg, so the .git exclusion goes last)
+                cmd = [
+                    self._rg, "--no-config", "-n", "-H", "--no-heading",
+                    "--hidden", "--no-ignore",
+                    f"--max-columns={self.MAX_COLUMNS}", "--max-columns-preview",
+                    "-g", file_pattern, "-g", "!.git", "-e", pattern
+                ]
+            else:
+                # -E so the pattern reads the same as under rg's regex syntax
+                cmd = [
+                    "grep", "-r", "-E", "-n", "-H", "-I", "--exclude-dir=.git",
+                    "--include", file_pattern, "-e", pattern
+                ]
+            if full_path != self._ws:
+                cmd.append(full_path[len(self._ws_prefix):])
+            returncode, output, stderr, truncated = _run_capped(
+                cmd, self.MAX_OUTPUT, timeout=60, cwd=self._ws
             )
             
-            if result.returncode == 0:
-                # Make paths relative
-                output = result.stdout
-                output = output.replace(workspace + "/", "")
+            if truncated:
+                output += "\n(output truncated)"
+            if returncode == 0 or (truncated and output):
                 return output or "No matches found"
-            elif result.returncode == 1:
+            elif returncode == 1:
                 return "No matches found"
             else:
-                return f"Search error: {result.stderr}"
+                return f"Search error: {stderr}"
         except subprocess.TimeoutExpired:
             return "Error: Search timed out"
         except Exception as e:
             return f"Error searching: {e}"
     
-    def get_schema(self) -> dict:
+    def _build_schema(self) -> dict:
         return {
             "type": "function",
             "function": {
@@ -411,12 +929,12 @@ class SearchFilesTool(Tool):
         }
 
 
-class ExecuteCommandTool(Tool):
+class ExecuteCommandTool(_WorkspaceTool):
     name = "execute_command"
     description = "Execute a shell command"
     
     # Allowed commands for security
-    ALLOWED_COMMANDS = {
+    ALLOWED_COMMANDS = frozenset({
         "npm", "yarn", "pnpm", "npx",
         "pip", "pip3", "python", "python3",
         "node",
@@ -428,7 +946,7 @@ class ExecuteCommandTool(Tool):
         "jq", "yq",
         "echo", "printf", "test", "mkdir", "cp", "mv", "rm", "touch",
         "chmod", "pwd", "cd", "which", "env",
-    }
+    })
     
     BLOCKED_PATTERNS = [
         r"rm\s+-rf\s+/",
@@ -438,71 +956,264 @@ class ExecuteCommandTool(Tool):
         r"curl.*\|\s*(ba)?sh",
         r"wget.*\|\s*(ba)?sh",
     ]
+    MAX_OUTPUT = 256 * 1024  # bytes; runaway output kills the command
+    
+    # Compiled once and fused so validation is a single scan of the command
+    _BLOCKED_RE = re.compile(
+        "|".join(f"(?:{pattern})" for pattern in BLOCKED_PATTERNS), re.IGNORECASE
+    )
+    
+    # Syntax only a shell can interpret (pipes, redirects, globs, expansions...);
+    # commands without any of it are exec'd directly, skipping the /bin/sh fork
+    _SHELL_SYNTAX_RE = re.compile(r"[|&;<>()$`*?\[\]{}~#\n\\]")
+    SHELL_BUILTINS = frozenset({"cd"})
+    
+    # Environment passed to commands: what toolchains need, nothing else
+    ENV_ALLOWLIST = frozenset({
+        "PATH", "LANG", "LANGUAGE", "TERM", "TZ", "TMPDIR", "USER", "LOGNAME", "SHELL",
+        "HTTP_PROXY", "HTTPS_PROXY", "NO_PROXY", "http_proxy", "https_proxy", "no_proxy",
+        "SSL_CERT_FILE", "SSL_CERT_DIR", "REQUESTS_CA_BUNDLE", "NODE_EXTRA_CA_CERTS",
+        "VIRTUAL_ENV", "JAVA_HOME",
+    })
+    ENV_ALLOWED_PREFIXES = ("LC_", "GO", "CARGO_", "RUSTUP_", "NODE_", "NPM_CONFIG_", "PIP_")
     
     def __init__(self, config: AgentConfig, logger: ProgressLogger):
-        self.config = config
-        self.logger = logger
+        super().__init__(config, logger)
+        self.refresh_env()
+    
+    def refresh_env(self):
+        """Rebuild the child environment (built once; call if os.environ changes)."""
+        self._child_env = {
+            key: value for key, value in os.environ.items()
+            if key in self.ENV_ALLOWLIST or key.startswith(self.ENV_ALLOWED_PREFIXES)
+        }
+        self._child_env["HOME"] = "/home/agent"
     
     def execute(self, command: str) -> str:
         self.logger.action("Executing command", command[:100])
         
         # Security check
-        is_safe, reason = self._validate_command(command)
+        is_safe, reason, argv = self._validate_command(command)
         if not is_safe:
             return f"Error: Command blocked - {reason}"
         
+        if argv:
+            output = self._run_in_process(argv)
+            if output is not None:
+                return output
+        
         try:
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
+            returncode, stdout, stderr, truncated = _run_capped(
+                argv or command,
+                self.MAX_OUTPUT,
                 timeout=self.config.command_timeout,
+                shell=argv is None,
                 cwd=self.config.workspace_dir,
-                env={**os.environ, "HOME": "/home/agent"}
+                env=self._child_env
             )
-            
-            output = ""
-            if result.stdout:
-                output += result.stdout
-            if result.stderr:
-                if output:
-                    output += "\n--- stderr ---\n"
-                output += result.stderr
-            
-            if result.returncode != 0:
-                output += f"\n(Exit code: {result.returncode})"
-            
-            return output or "(No output)"
+            return self._format_output(returncode, stdout, stderr, truncated)
             
         except subprocess.TimeoutExpired:
             return f"Error: Command timed out after {self.config.command_timeout}s"
         except Exception as e:
             return f"Error executing command: {e}"
     
-    def _validate_command(self, command: str) -> Tuple[bool, str]:
-        """Validate command against security rules."""
+    async def execute_async(self, command: str) -> str:
+        """Run the command on the event loop instead of blocking a thread on it."""
+        self.logger.action("Executing command", command[:100])
+        
+        is_safe, reason, argv = self._validate_command(command)
+        if not is_safe:
+            return f"Error: Command blocked - {reason}"
+        
+        if argv:
+            output = await asyncio.to_thread(self._run_in_process, argv)
+            if output is not None:
+                return output
+        
+        spawn_kwargs = dict(
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=self.config.workspace_dir,
+            env=self._child_env,
+            start_new_session=True
+        )
+        try:
+            if argv:
+                proc = await asyncio.create_subprocess_exec(*argv, **spawn_kwargs)
+            else:
+                proc = await asyncio.create_subprocess_shell(command, **spawn_kwargs)
+        except Exception as e:
+            return f"Error executing command: {e}"
+        
+        out, err = bytearray(), bytearray()
+        truncated = False
+        
+        def kill():
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        
+        async def pump(stream: asyncio.StreamReader, buf: bytearray):
+            nonlocal truncated
+            while not truncated:
+                chunk = await stream.read(65536)
+                if not chunk:
+                    return
+                buf += chunk
+                overflow = len(out) + len(err) - self.MAX_OUTPUT
+                if overflow > 0:
+                    del buf[len(buf) - overflow:]
+                    truncated = True
+                    kill()
+        
+        async def communicate() -> int:
+            await asyncio.gather(pump(proc.stdout, out), pump(proc.stderr, err))
+            return await proc.wait()
+        
+        try:
+            returncode = await asyncio.wait_for(communicate(), timeout=self.config.command_timeout)
+        except asyncio.TimeoutError:
+            kill()
+            await proc.wait()
+            return f"Error: Command timed out after {self.config.command_timeout}s"
+        
+        return self._format_output(
+            returncode,
+            out.decode("utf-8", "replace"),
+            err.decode("utf-8", "replace"),
+            truncated
+        )
+    
+    def _run_in_process(self, argv: List[str]) -> Optional[str]:
+        """Output of a trivial command done without spawning a process, or None."""
+        base_cmd = argv[0].split("/")[-1]
+        if base_cmd == "cp":
+            return "(No output)" if self._try_fast_copy(argv) else None
+        if base_cmd == "cat":
+            return self._try_fast_cat(argv[1:])
+        if base_cmd == "pwd" and len(argv) == 1:
+            return self.config.workspace_dir + "\n"
+        return None
+    
+    def _try_fast_cat(self, paths: List[str]) -> Optional[str]:
+        """Contents of plain `cat FILE...` in the workspace, read in-process.
+        
+        Returns None (letting real cat run and report) for flags, stdin,
+        paths outside the workspace, non-regular files, output over
+        MAX_OUTPUT or any error.
+        """
+        if not paths or any(path.startswith("-") for path in paths):
+            return None
+        chunks = []
+        total = 0
+        for path in paths:
+            full_path = self._safe_join(path)
+            if not full_path:
+                return None
+            try:
+                with open(full_path, "rb") as f:
+                    st = os.fstat(f.fileno())
+                    total += st.st_size
+                    if not stat.S_ISREG(st.st_mode) or total > self.MAX_OUTPUT:
+                        return None
+                    chunks.append(f.read())
+            except OSError:
+                return None
+        return self._format_output(0, b"".join(chunks).decode("utf-8", "replace"), "", False)
+    
+    def _try_fast_copy(self, argv: List[str]) -> bool:
+        """Handle a plain `cp SRC DST` inside the workspace with an in-kernel copy.
+        
+        Returns False (letting real cp run and report) for flags, multiple
+        sources, paths outside the workspace, non-regular files, a trailing
+        slash on a destination that is not a directory, or any error.
+        """
+        if len(argv) != 3 or argv[0].split("/")[-1] != "cp":
+            return False
+        src_rel, dst_rel = argv[1], argv[2]
+        if src_rel.startswith("-") or dst_rel.startswith("-"):
+            return False
+        src = self._safe_join(src_rel)
+        dst = self._safe_join(dst_rel)
+        if not src or not dst:
+            return False
+        
+        try:
+            src_fd = os.open(src, os.O_RDONLY)
+        except OSError:
+            return False
+        try:
+            st = os.fstat(src_fd)
+            if not stat.S_ISREG(st.st_mode):
+                return False
+            if os.path.isdir(dst):
+                dst = os.path.join(dst, os.path.basename(src))
+            elif dst_rel.endswith("/"):
+                # Not an existing directory: let cp report "Not a directory"
+                return False
+            if os.path.exists(dst) and os.path.samefile(src, dst):
+                return False
+            # New files get the source's permission bits (less umask), like cp
+            dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, stat.S_IMODE(st.st_mode))
+            try:
+                while os.sendfile(dst_fd, src_fd, None, 1 << 30):
+                    pass
+            finally:
+                os.close(dst_fd)
+            return True
+        except OSError:
+            return False
+        finally:
+            os.close(src_fd)
+    
+    def _format_output(self, returncode: int, stdout: str, stderr: str, truncated: bool) -> str:
+        output = ""
+        if stdout:
+            output += stdout
+        if stderr:
+            if output:
+                output += "\n--- stderr ---\n"
+            output += stderr
+        
+        if truncated:
+            output += f"\n(Output truncated at {self.MAX_OUTPUT} bytes; command killed)"
+        elif returncode != 0:
+            output += f"\n(Exit code: {returncode})"
+        
+        return output or "(No output)"
+    
+    def _validate_command(self, command: str) -> Tuple[bool, str, Optional[List[str]]]:
+        """Validate command against security rules.
+        
+        Returns (is_safe, reason, argv); argv is None when the command needs
+        a shell to run.
+        """
         # Check blocked patterns
-        for pattern in self.BLOCKED_PATTERNS:
-            if re.search(pattern, command, re.IGNORECASE):
-                return False, f"Matches blocked pattern"
+        if self._BLOCKED_RE.search(command):
+            return False, f"Matches blocked pattern", None
         
         # Extract base command
         try:
             parts = shlex.split(command)
             if not parts:
-                return False, "Empty command"
+                return False, "Empty command", None
             base_cmd = parts[0].split("/")[-1]
         except ValueError:
             # shlex couldn't parse, try simple split
+            parts = None
             base_cmd = command.split()[0].split("/")[-1]
         
         if base_cmd not in self.ALLOWED_COMMANDS:
-            return False, f"Command '{base_cmd}' not allowed"
+            return False, f"Command '{base_cmd}' not allowed", None
         
-        return True, "OK"
+        if parts is None or base_cmd in self.SHELL_BUILTINS or self._SHELL_SYNTAX_RE.search(command):
+            return True, "OK", None
+        return True, "OK", parts
     
-    def get_schema(self) -> dict:
+    def _build_schema(self) -> dict:
         return {
             "type": "function",
             "function": {
@@ -522,29 +1233,55 @@ class ExecuteCommandTool(Tool):
         }
 
 
-class GitStatusTool(Tool):
-    name = "git_status"
-    description = "Check git status of the repository"
+class _GitTool(_WorkspaceTool):
+    """Base for git tools: one place that builds and runs git invocations."""
+    
+    # Applied to every invocation: preload the index in parallel and never
+    # start an auto-gc in the middle of a task
+    GIT_OPTIONS = ("-c", "core.preloadIndex=true", "-c", "gc.auto=0")
     
     def __init__(self, config: AgentConfig, logger: ProgressLogger):
-        self.config = config
-        self.logger = logger
+        super().__init__(config, logger)
+        # Read-only commands skip refreshing (and locking) the index
+        self._env = {**os.environ, "GIT_OPTIONAL_LOCKS": "0"}
+    
+    def _run_git(self, *args: str, check: bool = False) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            ["git", "-C", self._ws, *self.GIT_OPTIONS, *args],
+            capture_output=True,
+            text=True,
+            env=self._env,
+            check=check
+        )
+    
+    def unpushed_commits(self) -> Optional[int]:
+        """Commits on HEAD not on any remote-tracking branch (None if unknown)."""
+        result = self._run_git("rev-list", "--count", "HEAD", "--not", "--remotes")
+        if result.returncode != 0:
+            return None
+        return int(result.stdout.strip() or 0)
+    
+    def head_files(self) -> List[str]:
+        """Paths touched by the HEAD commit."""
+        result = self._run_git("show", "--name-only", "--format=", "HEAD", check=True)
+        return result.stdout.splitlines()
+
+
+class GitStatusTool(_GitTool):
+    name = "git_status"
+    description = "Check git status of the repository"
     
     def execute(self) -> str:
         self.logger.action("Checking git status")
         
         try:
-            result = subprocess.run(
-                ["git", "status"],
-                capture_output=True,
-                text=True,
-                cwd=self.config.workspace_dir
-            )
+            # Short format: branch/tracking line plus one line per path
+            result = self._run_git("status", "--short", "--branch")
             return result.stdout + result.stderr
         except Exception as e:
             return f"Error: {e}"
     
-    def get_schema(self) -> dict:
+    def _build_schema(self) -> dict:
         return {
             "type": "function",
             "function": {
@@ -559,33 +1296,24 @@ class GitStatusTool(Tool):
         }
 
 
-class GitDiffTool(Tool):
+class GitDiffTool(_GitTool):
     name = "git_diff"
     description = "Show git diff of changes"
     
-    def __init__(self, config: AgentConfig, logger: ProgressLogger):
-        self.config = config
-        self.logger = logger
-    
     def execute(self, staged: bool = False) -> str:
         self.logger.action("Getting git diff", "staged" if staged else "unstaged")
         
         try:
-            cmd = ["git", "diff"]
+            args = ["diff"]
             if staged:
-                cmd.append("--staged")
+                args.append("--staged")
             
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                cwd=self.config.workspace_dir
-            )
+            result = self._run_git(*args)
             return result.stdout or "(No changes)"
         except Exception as e:
             return f"Error: {e}"
     
-    def get_schema(self) -> dict:
+    def _build_schema(self) -> dict:
         return {
             "type": "function",
             "function": {
@@ -606,32 +1334,19 @@ class GitDiffTool(Tool):
         }
 
 
-class GitCommitTool(Tool):
+class GitCommitTool(_GitTool):
     name = "git_commit"
     description = "Stage all changes and create a commit"
     
-    def __init__(self, config: AgentConfig, logger: ProgressLogger):
-        self.config = config
-        self.logger = logger
-    
     def execute(self, message: str) -> str:
         self.logger.action("Creating git commit", message[:50])
         
         try:
             # Stage all changes
-            subprocess.run(
-                ["git", "add", "-A"],
-                cwd=self.config.workspace_dir,
-                check=True
-            )
+            self._run_git("add", "-A", check=True)
             
             # Commit
-            result = subprocess.run(
-                ["git", "commit", "-m", message],
-                capture_output=True,
-                text=True,
-                cwd=self.config.workspace_dir
-            )
+            result = self._run_git("commit", "-m", message)
             
             return result.stdout + result.stderr
         except subprocess.CalledProcessError as e:
@@ -639,7 +1354,7 @@ class GitCommitTool(Tool):
         except Exception as e:
             return f"Error: {e}"
     
-    def get_schema(self) -> dict:
+    def _build_schema(self) -> dict:
         return {
             "type": "function",
             "function": {
@@ -659,35 +1374,26 @@ class GitCommitTool(Tool):
         }
 
 
-class GitPushTool(Tool):
+class GitPushTool(_GitTool):
     name = "git_push"
     description = "Push commits to the remote repository"
     
-    def __init__(self, config: AgentConfig, logger: ProgressLogger):
-        self.config = config
-        self.logger = logger
-    
     def execute(self, branch: Optional[str] = None, force: bool = False) -> str:
         branch = branch or self.config.branch
         self.logger.action("Pushing to remote", branch)
         
         try:
-            cmd = ["git", "push", "origin", branch]
+            args = ["push", "origin", branch]
             if force:
-                cmd.insert(2, "-f")
+                args.insert(1, "-f")
             
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                cwd=self.config.workspace_dir
-            )
+            result = self._run_git(*args)
             
             return result.stdout + result.stderr
         except Exception as e:
             return f"Error: {e}"
     
-    def get_schema(self) -> dict:
+    def _build_schema(self) -> dict:
         return {
             "type": "function",
             "function": {
@@ -732,13 +1438,13 @@ class TaskCompleteTool(Tool):
             "files_changed": files_changed or []
         }
         
-        with open("/opt/agent/result.json", "w") as f:
-            json.dump(result, f, indent=2)
+        # Serialize in one go and write once, rather than json.dump's many small writes
+        _write_bytes("/opt/agent/result.json", json.dumps(result, indent=2).encode("utf-8"))
         
         self.logger.complete(summary)
         return "Task marked as complete"
     
-    def get_schema(self) -> dict:
+    def _build_schema(self) -> dict:
         return {
             "type": "function",
             "function": {
@@ -798,9 +1504,34 @@ class CodingAgent:
 
 You have tools for file operations (read, write, list, search), command execution, and git operations. Use them systematically to accomplish the task.
 
+## Efficiency
+
+- Do not write prose between tool calls unless strictly necessary; let the tool calls speak.
+- Request independent reads (files, listings, searches) together in one turn.
+- Read large files in parts with offset/limit instead of whole.
+
 When you're done, use the task_complete tool to mark the task as finished.
 """
     
+    # Read-only tools whose calls may run concurrently within one step
+    PARALLEL_SAFE = frozenset({
+        "read_file", "read_files", "list_files", "search_files",
+        "git_status", "git_diff",
+    })
+    MAX_PARALLEL_TOOLS = 8
+    CLONE_ATTEMPTS = 3
+    MAX_OUTPUT_TOKENS = 4096
+    MIN_OUTPUT_TOKENS = 256  # below this, compact history first
+    CONTEXT_MARGIN = 512  # slack for token-count error and message framing
+    
+    # heuristic_shortcuts: assistant text announcing the work is finished
+    _DONE_RE = re.compile(
+        r"\b(?:task (?:is )?(?:now )?(?:complete|completed|done|finished)"
+        r"|(?:all|everything) (?:is )?(?:done|complete)"
+        r"|(?:implementation|changes) (?:is |are )?(?:now )?complete)\b",
+        re.IGNORECASE
+    )
+    
     def __init__(self, config: AgentConfig, logger: ProgressLogger):
         self.config = config
         self.logger = logger
@@ -811,9 +1542,13 @@ When you're done, use the task_complete tool to mark the task as finished.
         if not api_base.endswith('/api'):
             api_base = f"{api_base}/api"
         
-        self.client = OpenAI(
+        self.client = _openai_sdk().AsyncOpenAI(
             base_url=f"{api_base}/v1",
-            api_key=config.openwebui_api_key or "not-required"
+            api_key=config.openwebui_api_key or "not-required",
+            http_client=self._build_http_client(),
+            # The SDK backs off with jitter on 429/5xx/connection errors
+            # and honors Retry-After
+            max_retries=config.max_retries
         )
         
         self.logger.info(f"Using Open WebUI API at {api_base}")
@@ -822,17 +1557,62 @@ When you're done, use the task_complete tool to mark the task as finished.
         # Initialize tools
         self.tools = self._init_tools()
         self.tool_map = {tool.name: tool for tool in self.tools}
+        # Built once: the same list object (and thus the same serialized
+        # tool block) goes out with every request
+        self._tools_schema: List[dict] = [tool.get_schema() for tool in self.tools]
         
-        # Conversation history
+        # Conversation history. It always starts with the same frozen prefix
+        # and is only ever appended to, so the provider can reuse its cached
+        # prefill of everything sent before.
+        self._static_prefix: Tuple[Dict, ...] = self._build_static_prefix()
         self.messages: List[Dict] = []
         
+        # Read-only tool calls started while the completion is still streaming,
+        # keyed by tool_call id
+        self._early_results: Dict[str, asyncio.Task] = {}
+        
+        # Read-only results by (tool, canonical args), reused within and across
+        # steps until a tool that may change the workspace runs
+        self._read_cache: Dict[Tuple[str, bytes], asyncio.Task] = {}
+        
+        # Token counts per message (keyed by id(); messages are never mutated)
+        self._token_counts: Dict[int, int] = {}
+        self._encoder = None
+        self._tools_tokens: Optional[int] = None
+        # History summary being produced in the background:
+        # (number of messages after the prefix it replaces, task)
+        self._compaction: Optional[Tuple[int, asyncio.Task]] = None
+        
         # Task completion flag
         self.task_completed = False
     
+    @staticmethod
+    def _build_http_client():
+        """One persistent keep-alive connection pool for every LLM request.
+        
+        HTTP/2 is used only when the optional h2 package is installed.
+        Returns None (SDK default client) if httpx is unavailable.
+        """
+        # httpx ships with the openai SDK; tune its connection pool when available
+        try:
+            import httpx
+        except ImportError:
+            return None
+        return httpx.AsyncClient(
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(max_keepalive_connections=8, keepalive_expiry=600),
+            timeout=httpx.Timeout(600, connect=10)
+        )
+    
+    async def close(self):
+        """Release the HTTP connection pool."""
+        await self.client.close()
+    
     def _init_tools(self) -> List[Tool]:
         """Initialize all available tools."""
         return [
             ReadFileTool(self.config, self.logger),
+            BatchReadFileTool(self.config, self.logger),
             WriteFileTool(self.config, self.logger),
             ListFilesTool(self.config, self.logger),
             SearchFilesTool(self.config, self.logger),
@@ -844,24 +1624,49 @@ When you're done, use the task_complete tool to mark the task as finished.
             TaskCompleteTool(self.config, self.logger),
         ]
     
+    def _build_static_prefix(self) -> Tuple[Dict, ...]:
+        """System prompt and task message; identical on every request."""
+        return (
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": f"""## Task
+
+{self.config.task_description}
+
+## Repository
+
+URL: {self.config.repository_url}
+Branch: {self.config.branch}
+Working Directory: {self.config.workspace_dir}
+
+Please begin by exploring the repository structure to understand the codebase, then implement the requested changes.
+"""}
+        )
+    
     def clone_repository(self):
         """Clone the repository to the workspace."""
         self.logger.info(f"Cloning repository: {self.config.repository_url}")
         
-        # Ensure workspace is empty
-        if os.path.exists(self.config.workspace_dir):
-            subprocess.run(["rm", "-rf", self.config.workspace_dir], check=True)
-        os.makedirs(self.config.workspace_dir, exist_ok=True)
-        
-        # Clone
-        result = subprocess.run(
-            ["git", "clone", "-b", self.config.branch, "--single-branch",
-             self.config.repository_url, self.config.workspace_dir],
-            capture_output=True,
-            text=True
-        )
-        
-        if result.returncode != 0:
+        for attempt in range(self.CLONE_ATTEMPTS):
+            if attempt:
+                delay = 2 ** attempt + random.random()
+                self.logger.info(f"Clone failed, retrying in {delay:.1f}s: {result.stderr.strip()}")
+                time.sleep(delay)
+            
+            # Ensure workspace is empty
+            shutil.rmtree(self.config.workspace_dir, ignore_errors=True)
+            os.makedirs(self.config.workspace_dir, exist_ok=True)
+            
+            # Clone (only the tip of the branch unless full history is wanted)
+            result = subprocess.run(
+                ["git", "clone", "-b", self.config.branch, "--single-branch",
+                 *(("--depth=1", "--filter=blob:none") if self.config.shallow_clone else ()),
+                 self.config.repository_url, self.config.workspace_dir],
+                capture_output=True,
+                text=True
+            )
+            if result.returncode == 0:
+                break
+        else:
             raise RuntimeError(f"Failed to clone repository: {result.stderr}")
         
         # Configure git
@@ -876,7 +1681,7 @@ When you're done, use the task_complete tool to mark the task as finished.
         
         self.logger.success("Repository cloned successfully")
     
-    def run(self):
+    async def run(self):
         """Main agent loop."""
         self.logger.info(f"Starting task: {self.config.task_description}")
         
@@ -888,29 +1693,21 @@ When you're done, use the task_complete tool to mark the task as finished.
             return
         
         # Initialize conversation
-        self.messages = [
-            {"role": "system", "content": self.SYSTEM_PROMPT},
-            {"role": "user", "content": f"""## Task
-
-{self.config.task_description}
-
-## Repository
-
-URL: {self.config.repository_url}
-Branch: {self.config.branch}
-Working Directory: {self.config.workspace_dir}
-
-Please begin by exploring the repository structure to understand the codebase, then implement the requested changes.
-"""}
-        ]
+        self.messages = list(self._static_prefix)
         
         # Run agent loop
         for iteration in range(self.config.max_iterations):
             self.logger.info(f"Iteration {iteration + 1}/{self.config.max_iterations}")
             
             try:
+                # Keep the prompt within budget before sending it, and leave
+                # room in the context window for a useful reply
+                await self._compact_history()
+                if self._output_budget() < self.MIN_OUTPUT_TOKENS:
+                    await self._compact_history(force=True)
+                
                 # Get LLM response
-                response = self._get_completion()
+                response = await self._get_completion()
                 
                 # Handle response
                 if not response:
@@ -922,10 +1719,13 @@ Please begin by exploring the repository structure to understand the codebase, t
                 
                 if message.tool_calls:
                     # Execute tool calls
-                    self.messages.append(message.model_dump())
+                    # exclude_none keeps the serialized turn minimal and stable
+                    self.messages.append(message.model_dump(exclude_none=True))
+                    # Summarize older turns while the tools run
+                    self._start_compaction()
                     
-                    for tool_call in message.tool_calls:
-                        result = self._execute_tool(tool_call)
+                    results = await self._execute_tool_calls(message.tool_calls)
+                    for tool_call, result in results:
                         self.messages.append({
                             "role": "tool",
                             "tool_call_id": tool_call.id,
@@ -936,10 +1736,14 @@ Please begin by exploring the repository structure to understand the codebase, t
                         if tool_call.function.name == "task_complete":
                             self.task_completed = True
                             return
+                    
+                    if self.config.heuristic_shortcuts and await self._finished_and_pushed(message, results):
+                        await self._complete_without_llm(message.content)
+                        return
                 else:
                     # Just text response - add to history
                     if message.content:
-                        self.logger.thinking(message.content[:200])
+                        self.logger.thinking(message.content)
                         self.messages.append({
                             "role": "assistant",
                             "content": message.content
@@ -962,22 +1766,334 @@ Please begin by exploring the repository structure to understand the codebase, t
         # Max iterations reached
         self.logger.fail("Max iterations reached without completing task")
     
-    def _get_completion(self):
+    async def _finished_and_pushed(self, message, results: List[Tuple[Any, str]]) -> bool:
+        """Whether this step ended in a push, leaving nothing unpushed, and the
+        model called the work finished.
+        
+        Then the only thing left for another LLM turn is task_complete. A
+        commit alone never qualifies: the model may still mean to push it,
+        and unpushed work is lost with the VM.
+        """
+        if not results or not message.content or not self._DONE_RE.search(message.content):
+            return False
+        last_call, _ = results[-1]
+        if last_call.function.name != "git_push":
+            return False
+        unpushed = await asyncio.to_thread(self.tool_map["git_push"].unpushed_commits)
+        return unpushed == 0
+    
+    async def _complete_without_llm(self, summary: str):
+        """Mark the task complete directly, listing the files of the last commit."""
+        self.logger.info("Work pushed and declared finished; completing without another LLM turn")
+        try:
+            files_changed = await asyncio.to_thread(self.tool_map["git_push"].head_files)
+        except Exception:
+            files_changed = []
+        await self.tool_map["task_complete"].execute_async(
+            summary=summary.strip(), files_changed=files_changed
+        )
+        self.task_completed = True
+    
+    def _count_tokens(self, message: Dict) -> int:
+        """Token count for one message, cached; ~4 chars/token without tiktoken."""
+        key = id(message)
+        count = self._token_counts.get(key)
+        if count is None:
+            text = message.get("content") or ""
+            for call in message.get("tool_calls") or ():
+                text += call["function"]["name"] + call["function"]["arguments"]
+            self._token_counts[key] = self._count_text(text) + 4  # per-message overhead
+        return self._token_counts[key]
+    
+    def _count_text(self, text: str) -> int:
+        if self._encoder is None:
+            self._encoder = self._load_encoder()
+        if self._encoder:
+            return len(self._encoder.encode(text, disallowed_special=()))
+        return len(text) // 4
+    
+    def _output_budget(self) -> int:
+        """max_tokens that still fits the context window after the prompt."""
+        if self._tools_tokens is None:
+            self._tools_tokens = self._count_text(json.dumps(self._tools_schema))
+        used = sum(map(self._count_tokens, self.messages)) + self._tools_tokens
+        return min(self.MAX_OUTPUT_TOKENS, self.config.context_window - used - self.CONTEXT_MARGIN)
+    
+    def _load_encoder(self):
+        """tiktoken encoding for the model, or False if it cannot be loaded."""
+        # Optional: exact token counts for context trimming (estimated otherwise)
+        try:
+            import tiktoken
+        except ImportError:
+            return False
+        try:
+            try:
+                return tiktoken.encoding_for_model(self.config.model)
+            except KeyError:
+                return tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # BPE files are downloaded on first use; offline VMs estimate instead
+            self.logger.error(f"tiktoken unavailable, estimating token counts: {e}")
+            return False
+    
+    def _start_compaction(self, force: bool = False):
+        """Begin summarizing older turns if the history exceeds its budget.
+        
+        The static prefix and the most recent messages are kept verbatim; a
+        previous summary is simply part of what gets re-summarized. Messages
+        are only appended until _compact_history splices the summary in.
+        """
+        if self._compaction is not None:
+            return
+        if not force and sum(map(self._count_tokens, self.messages)) <= self.config.max_context_tokens:
+            return
+        
+        head = len(self._static_prefix)
+        start = max(head, len(self.messages) - self.config.keep_recent_messages)
+        # Never open the kept window with tool results cut off from their call
+        while start > head and self.messages[start]["role"] == "tool":
+            start -= 1
+        if start - head < 2:
+            # Nothing to gain from re-summarizing a lone summary
+            return
+        
+        dropped = self.messages[head:start]
+        self.logger.info(f"Summarizing {len(dropped)} earlier messages to stay within context budget")
+        self._compaction = (len(dropped), asyncio.create_task(self._summarize(dropped)))
+    
+    async def _compact_history(self, force: bool = False):
+        """Replace the summarized turns with their summary, if one is due."""
+        self._start_compaction(force)
+        if self._compaction is None:
+            return
+        count, task = self._compaction
+        self._compaction = None
+        summary = await task
+        
+        head = len(self._static_prefix)
+        for message in self.messages[head:head + count]:
+            self._token_counts.pop(id(message), None)
+        self.messages = [
+            *self._static_prefix,
+            {"role": "user", "content": f"## Progress so far (summary of earlier steps)\n\n{summary}"},
+            *self.messages[head + count:]
+        ]
+    
+    async def _summarize(self, messages: List[Dict]) -> str:
+        """Condense a run of messages with a side request; plain note on failure."""
+        lines = []
+        for message in messages:
+            role = message["role"]
+            if message.get("content"):
+                lines.append(f"[{role}] {message['content'][:2000]}")
+            for call in message.get("tool_calls") or ():
+                lines.append(f"[call] {call['function']['name']}({call['function']['arguments'][:500]})")
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.config.summary_model or self.config.model,
+                messages=[
+                    {"role": "system", "content": (
+                        "Summarize this coding agent transcript for the agent itself. "
+                        "Keep file paths, decisions, changes made, command results "
+                        "that matter and open problems. Be concise."
+                    )},
+                    {"role": "user", "content": "\n".join(lines)}
+                ],
+                max_tokens=1024
+            )
+            return response.choices[0].message.content or ""
+        except Exception as e:
+            self.logger.error(f"History summarization failed: {e}")
+            return f"({len(messages)} earlier messages were dropped to save context.)"
+    
+    async def _get_completion(self):
         """Get completion from LLM."""
-        return self.client.chat.completions.create(
-            model=self.config.model,
-            messages=self.messages,
-            tools=[tool.get_schema() for tool in self.tools],
-            tool_choice="auto",
-            max_tokens=4096
+        request = {
+            "model": self.config.model,
+            "messages": self.messages,
+            "tools": self._tools_schema,
+            "tool_choice": "auto",
+            "max_tokens": max(self._output_budget(), self.MIN_OUTPUT_TOKENS)
+        }
+        self._early_results.clear()
+        if not self.config.cache_enabled:
+            return await self._create_completion(request)
+        
+        # Content-addressed: an identical request replays the stored response
+        key = hashlib.blake2b(
+            _json_dumps_sorted(request), digest_size=32
+        ).hexdigest()
+        cache_dir = os.path.expanduser(self.config.cache_dir)
+        path = os.path.join(cache_dir, f"{key}.json")
+        try:
+            with open(path, "rb") as f:
+                cached = _json_loads(f.read())
+            self.logger.info("LLM response served from cache")
+            return _chat_completion(cached)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.error(f"Ignoring unreadable cache entry {key}: {e}")
+        
+        response = await self._create_completion(request)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Write then rename so a crash never leaves a truncated entry
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            _write_bytes(tmp_path, response.model_dump_json().encode("utf-8"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.logger.error(f"Failed to cache LLM response: {e}")
+        return response
+    
+    async def _create_completion(self, request: Dict) -> "ChatCompletion":
+        """Call the API, streaming unless disabled."""
+        if not self.config.stream:
+            return await self.client.chat.completions.create(**request)
+        
+        # Reassemble the stream into a regular ChatCompletion so callers
+        # (and the response cache) see the same shape either way
+        content: List[str] = []
+        calls: Dict[int, Dict] = {}
+        finish_reason = None
+        response_id, created, model = "", int(time.time()), self.config.model
+        dispatching = True  # only a leading run of read-only calls starts early
+        
+        async for chunk in await self.client.chat.completions.create(**request, stream=True):
+            response_id = chunk.id or response_id
+            created = chunk.created or created
+            model = chunk.model or model
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            finish_reason = choice.finish_reason or finish_reason
+            delta = choice.delta
+            if delta.content:
+                content.append(delta.content)
+            for tc in delta.tool_calls or ():
+                call = calls.setdefault(tc.index, {"id": "", "name": "", "arguments": []})
+                if tc.id:
+                    call["id"] = tc.id
+                if tc.function:
+                    if tc.function.name:
+                        call["name"] += tc.function.name
+                    if tc.function.arguments:
+                        call["arguments"].append(tc.function.arguments)
+                        if dispatching:
+                            dispatching = self._dispatch_early(calls, tc.index)
+        
+        message: Dict[str, Any] = {"role": "assistant", "content": "".join(content) or None}
+        if calls:
+            message["tool_calls"] = [
+                {
+                    "id": call["id"],
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": "".join(call["arguments"])}
+                }
+                for _, call in sorted(calls.items())
+            ]
+        return _chat_completion({
+            "id": response_id or "stream",
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "finish_reason": finish_reason or ("tool_calls" if calls else "stop"),
+                "message": message
+            }]
+        })
+    
+    def _dispatch_early(self, calls: Dict[int, Dict], index: int) -> bool:
+        """Start calls[index] now if its arguments are complete and it is read-only.
+        
+        Returns False once early dispatch must stop: a call that is not
+        PARALLEL_SAFE has to run in order after the ones before it.
+        """
+        call = calls[index]
+        if call["id"] in self._early_results:
+            return True
+        if index != len(self._early_results):
+            # An earlier call is still incomplete; keep strict ordering
+            return True
+        arguments = "".join(call["arguments"])
+        if not arguments.rstrip().endswith("}"):
+            return True
+        try:
+            _json_loads(arguments)
+        except json.JSONDecodeError:
+            return True
+        if call["name"] not in self.PARALLEL_SAFE or not call["id"]:
+            return False
+        
+        tool_call = SimpleNamespace(
+            id=call["id"],
+            function=SimpleNamespace(name=call["name"], arguments=arguments)
         )
+        self._early_results[call["id"]] = self._cached_read(tool_call)
+        return True
+    
+    async def _execute_tool_calls(self, tool_calls) -> List[Tuple[Any, str]]:
+        """Execute one step's tool calls, in order, overlapping read-only ones.
+        
+        Runs of consecutive PARALLEL_SAFE calls are gathered; everything else
+        runs sequentially. Stops after task_complete, like the calls after it
+        were never made.
+        """
+        results: List[Tuple[Any, str]] = []
+        i = 0
+        while i < len(tool_calls):
+            j = i
+            while j < len(tool_calls) and tool_calls[j].function.name in self.PARALLEL_SAFE:
+                j += 1
+            if j - i > 1:
+                batch = tool_calls[i:j]
+                slots = asyncio.Semaphore(self.MAX_PARALLEL_TOOLS)
+                
+                async def bounded(call):
+                    async with slots:
+                        return await self._execute_tool(call)
+                
+                outputs = await asyncio.gather(*(bounded(call) for call in batch))
+                results.extend(zip(batch, outputs))
+                i = j
+                continue
+            
+            tool_call = tool_calls[i]
+            results.append((tool_call, await self._execute_tool(tool_call)))
+            if tool_call.function.name == "task_complete":
+                break
+            i += 1
+        return results
     
-    def _execute_tool(self, tool_call) -> str:
+    async def _execute_tool(self, tool_call) -> str:
         """Execute a tool call and return the result."""
+        early = self._early_results.pop(tool_call.id, None)
+        if early is not None:
+            return await early
+        if tool_call.function.name in self.PARALLEL_SAFE:
+            return await self._cached_read(tool_call)
+        self._read_cache.clear()
+        return await self._invoke_tool(tool_call)
+    
+    def _cached_read(self, tool_call) -> asyncio.Task:
+        """Task for a read-only call, shared with any identical earlier call."""
+        try:
+            key = (tool_call.function.name, _json_dumps_sorted(_json_loads(tool_call.function.arguments)))
+        except (json.JSONDecodeError, TypeError):
+            return asyncio.ensure_future(self._invoke_tool(tool_call))
+        task = self._read_cache.get(key)
+        if task is None:
+            task = self._read_cache[key] = asyncio.ensure_future(self._invoke_tool(tool_call))
+        else:
+            self.logger.info(f"Reusing result of identical {tool_call.function.name} call")
+        return task
+    
+    async def _invoke_tool(self, tool_call) -> str:
         name = tool_call.function.name
         
         try:
-            args = json.loads(tool_call.function.arguments)
+            args = _json_loads(tool_call.function.arguments)
         except json.JSONDecodeError:
             return f"Error: Invalid JSON arguments: {tool_call.function.arguments}"
         
@@ -986,19 +2102,80 @@ Please begin by exploring the repository structure to understand the codebase, t
             return f"Error: Unknown tool '{name}'"
         
         try:
-            result = tool.execute(**args)
-            # Truncate very long results
-            if len(result) > 10000:
-                result = result[:10000] + "\n\n... (truncated)"
-            return result
+            result = await tool.execute_async(**args)
+            return tool.truncate(result)
         except Exception as e:
             return f"Error executing {name}: {e}"
 
 
+class BatchCodingAgent(CodingAgent):
+    """Coding agent whose completions go through the Batch API.
+    
+    Batched requests are billed at half price but may take up to the
+    completion window to finish, so this is only for unattended runs
+    (bulk migrations, CI). Each step still depends on the previous one,
+    so every batch holds a single request. The API endpoint must serve
+    /v1/files and /v1/batches.
+    """
+    
+    TERMINAL_STATES = frozenset({"completed", "failed", "expired", "cancelled"})
+    
+    async def _create_completion(self, request: Dict) -> "ChatCompletion":
+        line = json.dumps({
+            "custom_id": "step",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": request
+        })
+        batch_file = await self.client.files.create(
+            file=("batch_requests.jsonl", line.encode("utf-8")),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        self.logger.info(f"Submitted batch {batch.id}")
+        
+        try:
+            while batch.status not in self.TERMINAL_STATES:
+                await asyncio.sleep(self.config.batch_poll_interval)
+                batch = await self.client.batches.retrieve(batch.id)
+            
+            output_id = batch.output_file_id or batch.error_file_id
+            if batch.status != "completed" or not output_id:
+                raise RuntimeError(f"Batch {batch.id} ended with status {batch.status}")
+            
+            output = await self.client.files.content(output_id)
+            result = json.loads(output.text.splitlines()[0])
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                raise RuntimeError(
+                    f"Batch request failed: {result.get('error') or response.get('body')}"
+                )
+            return _chat_completion(response["body"])
+        finally:
+            for file_id in (batch_file.id, batch.output_file_id, batch.error_file_id):
+                if file_id:
+                    try:
+                        await self.client.files.delete(file_id)
+                    except Exception:
+                        pass
+
+
 # ============================================================================
 # Main
 # ============================================================================
 
+async def _run_agent(agent: CodingAgent):
+    """Run the agent on one event loop, closing its client afterwards."""
+    try:
+        await agent.run()
+    finally:
+        await agent.close()
+
+
 def main():
     """Main entry point."""
     logger = ProgressLogger()
@@ -1006,6 +2183,8 @@ def main():
     try:
         logger.info("Loading configuration...")
         config = AgentConfig.load()
+        if config.progress_serial_device:
+            logger.attach_serial(config.progress_serial_device)
         
         logger.info(f"Task ID: {config.task_id}")
         logger.info(f"Repository: {config.repository_url}")
@@ -1013,8 +2192,9 @@ def main():
         logger.info(f"Model: {config.model} (via Open WebUI)")
         logger.info(f"Open WebUI API: {config.openwebui_api_url}")
         
-        agent = CodingAgent(config, logger)
-        agent.run()
+        agent_cls = BatchCodingAgent if config.batch_mode else CodingAgent
+        agent = agent_cls(config, logger)
+        asyncio.run(_run_agent(agent))
         
         if not agent.task_completed:
             logger.fail("Task did not complete successfully")
@@ -25,12 +25,15 @@ Environment Variables:
 import os
 import re
 import json
+import base64
 import asyncio
 import uuid
 import time
+import heapq
 from datetime import datetime
-from typing import Optional, List, Dict, Any, AsyncGenerator, Union
-from dataclasses import dataclass, field, asdict
+from typing import Optional, List, Dict, Any, AsyncGenerator, Union, Tuple
+from collections import Counter, deque
+from dataclasses import dataclass, field
 from enum import Enum
 import logging
 
@@ -38,6 +41,23 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("autonomous_coder")
 
+# Max base64 characters sent per guest-agent exec when injecting task config
+CONFIG_CHUNK_SIZE = 4096
+
+# Max progress polls in flight against Proxmox, regardless of task count
+MAX_INFLIGHT_POLLS = 8
+
+# Separates progress.log bytes from result.json in a progress poll's output
+RESULT_MARKER = "---AGENT-RESULT---"
+
+# Progress lines kept in memory per task
+MAX_PROGRESS_LINES = 10000
+
+# Disk snapshot of a never-booted agent VM; a used VM is rolled back to it
+# (and rebooted) before going back to the warm pool, so no processes, files,
+# packages or credentials survive from one task to the next
+POOL_SNAPSHOT = "pool-clean"
+
 
 class TaskStatus(Enum):
     PENDING = "pending"
@@ -49,7 +69,7 @@ class TaskStatus(Enum):
     CANCELLED = "cancelled"
 
 
-@dataclass
+@dataclass(slots=True)
 class CodingTask:
     """Represents an autonomous coding task."""
     id: str
@@ -61,19 +81,57 @@ class CodingTask:
     vmid: Optional[int] = None
     vm_ip: Optional[str] = None
     vm_name: Optional[str] = None
-    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
-    started_at: Optional[str] = None
-    completed_at: Optional[str] = None
+    # Epoch seconds; formatted only when the task is serialized
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    completed_at: Optional[float] = None
     result: Optional[Dict] = None
-    progress_log: List[str] = field(default_factory=list)
+    # Bounded so a long-running agent cannot grow memory without limit
+    progress_log: deque = field(default_factory=lambda: deque(maxlen=MAX_PROGRESS_LINES))
     error: Optional[str] = None
 
-    def to_dict(self) -> Dict:
-        data = asdict(self)
-        data["status"] = self.status.value
+    @staticmethod
+    def _iso(ts: Optional[float]) -> Optional[str]:
+        return datetime.utcfromtimestamp(ts).isoformat() if ts is not None else None
+
+    @property
+    def created_at_iso(self) -> str:
+        return self._iso(self.created_at)
+
+    def to_dict(self, include_log: bool = True) -> Dict:
+        # Built by hand rather than with asdict() so nothing is deep-copied;
+        # the progress log is copied only when the caller wants it
+        data = {
+            "id": self.id,
+            "status": self.status.value,
+            "repository_url": self.repository_url,
+            "branch": self.branch,
+            "task_description": self.task_description,
+            "model": self.model,
+            "vmid": self.vmid,
+            "vm_ip": self.vm_ip,
+            "vm_name": self.vm_name,
+            "created_at": self.created_at_iso,
+            "started_at": self._iso(self.started_at),
+            "completed_at": self._iso(self.completed_at),
+            "result": self.result,
+            "error": self.error,
+        }
+        if include_log:
+            data["progress_log"] = list(self.progress_log)
         return data
 
 
+@dataclass(slots=True)
+class ProgressWatch:
+    """Polling state for one task's progress log, owned by the poll scheduler."""
+    task: CodingTask
+    queue: asyncio.Queue  # new log lines; None marks the end of the stream
+    interval: float
+    offset: int = 0  # bytes of progress.log already consumed
+    adaptive: bool = True  # False keeps a fixed (slow) interval, e.g. as a serial fallback
+
+
 class ProxmoxManager:
     """Manages Proxmox VM lifecycle for coding agents."""
     
@@ -84,7 +142,14 @@ class ProxmoxManager:
         password: str,
         node: str = "pve",
         template_vmid: int = 9000,
-        verify_ssl: bool = False
+        verify_ssl: bool = False,
+        poll_initial_delay: float = 0.25,
+        poll_max_delay: float = 10.0,
+        poll_growth: float = 1.5,
+        exec_poll_initial: float = 0.025,
+        exec_poll_max: float = 1.0,
+        pool_size: int = 0,
+        pool_owner: Optional[str] = None
     ):
         self.host = host
         self.user = user
@@ -92,8 +157,30 @@ class ProxmoxManager:
         self.node = node
         self.template_vmid = template_vmid
         self.verify_ssl = verify_ssl
+        # Exponential backoff schedule for Proxmox task/guest-agent polling
+        self.poll_initial_delay = poll_initial_delay
+        self.poll_max_delay = poll_max_delay
+        self.poll_growth = poll_growth
+        # Short-poll schedule for guest-agent exec results
+        self.exec_poll_initial = exec_poll_initial
+        self.exec_poll_max = exec_poll_max
         self._proxmox = None
         self._vm_pool_start = 10000
+        # VMIDs seen in the cluster (None = refresh on next allocation) and
+        # VMIDs handed out by this manager that may not be visible there yet
+        self._used_vmids: Optional[set] = None
+        self._issued_vmids: set = set()
+        self._next_vmid = self._vm_pool_start
+        self._vmid_lock = asyncio.Lock()
+        # Warm pool of booted, idle agent VMs (0 disables pooling)
+        self.pool_size = pool_size
+        self._warm_pool: asyncio.Queue = asyncio.Queue()
+        self._pool_spec: Optional[Tuple[int, int, bool]] = None
+        # Clones and resets in flight; both count toward pool_size
+        self._pool_fills: set = set()
+        self._pool_resets = 0
+        # Tagged onto idle VMs so a restarted pipeline can tell whose they are
+        self.pool_owner = pool_owner or uuid.uuid4().hex
     
     def _get_client(self):
         """Lazy-load Proxmox API client."""
@@ -106,6 +193,7 @@ class ProxmoxManager:
                     password=self.password,
                     verify_ssl=self.verify_ssl
                 )
+                self._configure_session()
                 logger.info(f"Connected to Proxmox at {self.host}")
             except ImportError:
                 raise ImportError(
@@ -116,82 +204,320 @@ class ProxmoxManager:
                 raise
         return self._proxmox
     
-    def _get_next_vmid(self) -> int:
-        """Find next available VMID."""
-        proxmox = self._get_client()
-        vms = proxmox.cluster.resources.get(type="vm")
-        used_ids = {vm["vmid"] for vm in vms}
-        vmid = self._vm_pool_start
-        while vmid in used_ids:
-            vmid += 1
-        return vmid
+    def _configure_session(self):
+        """Mount a pooled, retrying HTTPS adapter on proxmoxer's requests session.
+        
+        Polling loops issue many small requests; keeping connections alive
+        avoids a TLS handshake per call.
+        """
+        session = getattr(self._proxmox, "_store", {}).get("session")
+        if session is None or not hasattr(session, "mount"):
+            logger.debug("Proxmox backend has no requests session; skipping pooling")
+            return
+        
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=64,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.2,
+                status_forcelist=[502, 503, 504]
+            )
+        )
+        session.mount("https://", adapter)
+        session.headers["Connection"] = "keep-alive"
+    
+    def close(self):
+        """Close pooled connections to Proxmox."""
+        if self._proxmox is None:
+            return
+        session = getattr(self._proxmox, "_store", {}).get("session")
+        if session is not None and hasattr(session, "close"):
+            session.close()
+        self._proxmox = None
+    
+    async def _call(self, fn, *args, **kwargs):
+        """Run a blocking proxmoxer call in a worker thread."""
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    
+    async def _allocate_vmid(self) -> int:
+        """Claim the next free VMID, querying the cluster only on a cold cache."""
+        async with self._vmid_lock:
+            if self._used_vmids is None:
+                proxmox = self._get_client()
+                vms = await self._call(proxmox.cluster.resources.get, type="vm")
+                self._used_vmids = {int(vm["vmid"]) for vm in vms}
+                self._next_vmid = self._vm_pool_start
+            
+            vmid = self._next_vmid
+            while vmid in self._used_vmids or vmid in self._issued_vmids:
+                vmid += 1
+            self._next_vmid = vmid + 1
+            self._issued_vmids.add(vmid)
+            return vmid
+    
+    def _release_vmid(self, vmid: int):
+        """Return a VMID to the free pool."""
+        self._issued_vmids.discard(vmid)
+        if self._used_vmids is not None:
+            self._used_vmids.discard(vmid)
+        self._next_vmid = max(self._vm_pool_start, min(self._next_vmid, vmid))
+    
+    def _invalidate_vmids(self):
+        """Force the next allocation to re-read VMIDs from the cluster."""
+        self._used_vmids = None
     
     async def create_agent_vm(
         self,
         task_id: str,
         task_config: Dict,
         cores: int = 2,
-        memory: int = 4096
+        memory: int = 4096,
+        serial_socket: bool = False
     ) -> Dict:
-        """Clone template and start an agent VM for a task."""
-        proxmox = self._get_client()
-        vmid = self._get_next_vmid()
-        vm_name = f"agent-{task_id[:8]}"
+        """Check out a warm agent VM for a task, cloning one if the pool is empty.
+        
+        With serial_socket, serial1 is exposed as a host-side Unix socket
+        (/var/run/qemu-server/<vmid>.serial1) for push-based progress.
+        """
+        if self._pool_spec == (cores, memory, serial_socket):
+            try:
+                vm = self._warm_pool.get_nowait()
+            except asyncio.QueueEmpty:
+                logger.info("Warm pool empty, cloning a new agent VM")
+            else:
+                logger.info(f"Checked out warm VM {vm['vmid']} for task {task_id}")
+                try:
+                    proxmox = self._get_client()
+                    await self._call(
+                        proxmox.nodes(self.node).qemu(vm["vmid"]).config.put,
+                        tags=f"agent,task-{task_id}"
+                    )
+                except Exception as e:
+                    logger.warning(f"Failed to tag VM {vm['vmid']}: {e}")
+                return {**vm, "task_id": task_id}
         
-        logger.info(f"Creating agent VM {vm_name} (VMID: {vmid}) from template {self.template_vmid}")
+        vm = await self._provision_vm(
+            f"agent-{task_id[:8]}", f"agent,task-{task_id}", cores, memory, serial_socket,
+            snapshot=self.pool_size > 0
+        )
+        return {**vm, "task_id": task_id}
+    
+    async def _provision_vm(
+        self,
+        vm_name: str,
+        tags: str,
+        cores: int,
+        memory: int,
+        serial_socket: bool,
+        snapshot: bool = False
+    ) -> Dict:
+        """Clone the template, configure and boot it, and wait for its IP.
+        
+        With snapshot, the clean disk is snapshotted before first boot so
+        the VM can later be reset for the warm pool.
+        """
+        proxmox = self._get_client()
+        vmid = None
+        started = time.monotonic()
         
         try:
-            # Clone the template
-            clone_result = proxmox.nodes(self.node).qemu(self.template_vmid).clone.post(
-                newid=vmid,
-                name=vm_name,
-                full=1,
-                target=self.node
-            )
+            # Clone the template, re-syncing the VMID cache if another
+            # client grabbed the ID we picked
+            for attempt in range(3):
+                candidate = await self._allocate_vmid()
+                logger.info(f"Creating agent VM {vm_name} (VMID: {candidate}) from template {self.template_vmid}")
+                try:
+                    clone_result = await self._call(
+                        proxmox.nodes(self.node).qemu(self.template_vmid).clone.post,
+                        newid=candidate,
+                        name=vm_name,
+                        full=1,
+                        target=self.node
+                    )
+                    break
+                except Exception as e:
+                    # The clone was refused, so the VMID is not ours to clean up
+                    self._issued_vmids.discard(candidate)
+                    if attempt == 2 or "already exists" not in str(e):
+                        raise
+                    logger.warning(f"VMID {candidate} already in use, refreshing VMID cache")
+                    self._invalidate_vmids()
+            # Only from here on does a failure leave a VM of ours behind
+            vmid = candidate
+            
             logger.info(f"Clone task started: {clone_result}")
             
             # Wait for clone to complete
             await self._wait_for_task(clone_result)
+            logger.info(f"VM {vmid} cloned in {time.monotonic() - started:.1f}s")
             
-            # Configure the VM
-            proxmox.nodes(self.node).qemu(vmid).config.put(
-                cores=cores,
-                memory=memory,
-                tags=f"agent,task-{task_id}"
-            )
+            # Configure the VM (must land before start so the VM boots with it)
+            vm_config = {
+                "cores": cores,
+                "memory": memory,
+                "tags": tags
+            }
+            if serial_socket:
+                vm_config["serial1"] = "socket"
+            await self._call(proxmox.nodes(self.node).qemu(vmid).config.put, **vm_config)
+            
+            if snapshot:
+                try:
+                    upid = await self._call(
+                        proxmox.nodes(self.node).qemu(vmid).snapshot.post, snapname=POOL_SNAPSHOT
+                    )
+                    await self._wait_for_task(upid)
+                except Exception as e:
+                    # e.g. storage without snapshot support: the VM is
+                    # destroyed after use instead of pooled
+                    logger.warning(f"Failed to snapshot VM {vmid}, it will not be reused: {e}")
             
             # Start the VM
-            proxmox.nodes(self.node).qemu(vmid).status.start.post()
+            await self._call(proxmox.nodes(self.node).qemu(vmid).status.start.post)
             logger.info(f"Started VM {vmid}")
             
             # Wait for VM to get IP
             ip_address = await self._wait_for_ip(vmid, timeout=120)
-            logger.info(f"VM {vmid} got IP: {ip_address}")
+            logger.info(
+                f"VM {vmid} got IP: {ip_address} "
+                f"({time.monotonic() - started:.1f}s after provisioning began)"
+            )
             
             return {
                 "vmid": vmid,
                 "name": vm_name,
                 "ip_address": ip_address,
-                "task_id": task_id
+                "spec": (cores, memory, serial_socket)
             }
             
         except Exception as e:
             logger.error(f"Failed to create agent VM: {e}")
             # Cleanup on failure
+            if vmid is not None:
+                try:
+                    await self.destroy_vm(vmid)
+                except Exception:
+                    pass
+                self._release_vmid(vmid)
+            raise
+    
+    @property
+    def pool_tags(self) -> str:
+        """Tags carried by idle pooled VMs."""
+        return f"agent,pool,pool-{self.pool_owner}"
+    
+    def _pool_pending(self) -> int:
+        """Pooled VMs idle or on their way (cloning or resetting)."""
+        return self._warm_pool.qsize() + len(self._pool_fills) + self._pool_resets
+    
+    async def fill_pool(self, cores: int = 2, memory: int = 4096, serial_socket: bool = False):
+        """Boot idle agent VMs in parallel until the warm pool is full."""
+        self._pool_spec = (cores, memory, serial_socket)
+        missing = self.pool_size - self._pool_pending()
+        if missing <= 0:
+            return
+        logger.info(f"Filling warm pool with {missing} agent VM(s)")
+        await asyncio.gather(*(self._spawn_pool_fill() for _ in range(missing)))
+    
+    def _spawn_pool_fill(self) -> asyncio.Task:
+        """Start cloning one pool VM, tracked until it lands."""
+        fill = asyncio.create_task(self._add_pool_vm())
+        self._pool_fills.add(fill)
+        fill.add_done_callback(self._pool_fills.discard)
+        return fill
+    
+    async def _add_pool_vm(self):
+        """Provision one idle VM and park it in the warm pool."""
+        if self._pool_spec is None:
+            return
+        cores, memory, serial_socket = self._pool_spec
+        try:
+            vm = await self._provision_vm(
+                f"agent-pool-{uuid.uuid4().hex[:8]}", self.pool_tags, cores, memory, serial_socket,
+                snapshot=True
+            )
+            await self._warm_pool.put(vm)
+        except Exception as e:
+            logger.error(f"Failed to add VM to warm pool: {e}")
+    
+    async def release_agent_vm(self, vm: Dict) -> bool:
+        """Reset a finished agent VM and return it to the warm pool.
+        
+        The reset rolls the disk back to its pre-boot snapshot and boots it
+        again. Falls back to destroying the VM when pooling is disabled, the
+        pool is already full, or the reset fails (including VMs without the
+        snapshot). Returns True if the VM was pooled.
+        """
+        vmid = vm["vmid"]
+        if (
+            self._pool_spec is None
+            or vm.get("spec") != self._pool_spec
+            or self._pool_pending() >= self.pool_size
+        ):
+            await self.destroy_vm(vmid)
+            return False
+        
+        proxmox = self._get_client()
+        self._pool_resets += 1
+        try:
+            await self._stop_vm(vmid)
+            upid = await self._call(
+                proxmox.nodes(self.node).qemu(vmid).snapshot(POOL_SNAPSHOT).rollback.post
+            )
+            await self._wait_for_task(upid)
+            # The rollback restores the config too; make sure no task tag survives
+            await self._call(proxmox.nodes(self.node).qemu(vmid).config.put, tags=self.pool_tags)
+            await self._call(proxmox.nodes(self.node).qemu(vmid).status.start.post)
+            ip_address = await self._wait_for_ip(vmid, timeout=120)
+        except Exception as e:
+            logger.warning(f"Failed to reset VM {vmid}, destroying it: {e}")
+            # Keep the pool at strength in the background
+            if self._pool_spec is not None:
+                self._spawn_pool_fill()
+            await self.destroy_vm(vmid)
+            return False
+        finally:
+            self._pool_resets -= 1
+        
+        if self._pool_spec is None:
+            # Pool drained while this VM was resetting
+            await self.destroy_vm(vmid)
+            return False
+        await self._warm_pool.put({
+            "vmid": vmid,
+            "name": vm.get("name"),
+            "ip_address": ip_address,
+            "spec": vm["spec"]
+        })
+        logger.info(f"Returned VM {vmid} to warm pool")
+        return True
+    
+    async def drain_pool(self):
+        """Destroy every idle VM in the warm pool."""
+        self._pool_spec = None
+        # Let in-flight clones land so they are destroyed rather than leaked
+        if self._pool_fills:
+            await asyncio.gather(*self._pool_fills, return_exceptions=True)
+        while not self._warm_pool.empty():
+            vmid = self._warm_pool.get_nowait()["vmid"]
             try:
                 await self.destroy_vm(vmid)
-            except Exception:
-                pass
-            raise
+            except Exception as e:
+                logger.error(f"Failed to destroy pooled VM {vmid}: {e}")
     
     async def _wait_for_task(self, upid: str, timeout: int = 300):
-        """Wait for a Proxmox task to complete."""
+        """Wait for a Proxmox task to complete, backing off between polls."""
         proxmox = self._get_client()
         start = time.time()
+        delay = self.poll_initial_delay
         
         while time.time() - start < timeout:
             try:
-                status = proxmox.nodes(self.node).tasks(upid).status.get()
+                status = await self._call(proxmox.nodes(self.node).tasks(upid).status.get)
                 if status.get("status") == "stopped":
                     if status.get("exitstatus") == "OK":
                         return
@@ -200,7 +526,8 @@ class ProxmoxManager:
             except Exception as e:
                 if "does not exist" not in str(e):
                     raise
-            await asyncio.sleep(2)
+            await asyncio.sleep(delay)
+            delay = min(delay * self.poll_growth, self.poll_max_delay)
         
         raise TimeoutError(f"Task {upid} timed out after {timeout}s")
     
@@ -208,10 +535,14 @@ class ProxmoxManager:
         """Wait for VM to get an IP address via QEMU guest agent."""
         proxmox = self._get_client()
         start = time.time()
+        # The guest agent needs a while to come up after boot; start slower
+        delay = max(self.poll_initial_delay, 1.0)
         
         while time.time() - start < timeout:
             try:
-                agent_info = proxmox.nodes(self.node).qemu(vmid).agent.get("network-get-interfaces")
+                agent_info = await self._call(
+                    proxmox.nodes(self.node).qemu(vmid).agent.get, "network-get-interfaces"
+                )
                 for iface in agent_info.get("result", []):
                     if iface.get("name") not in ("lo", "localhost"):
                         for ip_info in iface.get("ip-addresses", []):
@@ -223,25 +554,35 @@ class ProxmoxManager:
                 # Guest agent might not be ready yet
                 logger.debug(f"Waiting for guest agent: {e}")
             
-            await asyncio.sleep(5)
+            await asyncio.sleep(delay)
+            delay = min(delay * self.poll_growth, self.poll_max_delay)
         
         logger.warning(f"VM {vmid} did not get IP within {timeout}s")
         return None
     
-    async def exec_command(self, vmid: int, command: str) -> Dict:
+    async def exec_command(self, vmid: int, command: str, timeout: float = 30) -> Dict:
         """Execute a command in the VM via guest agent."""
         proxmox = self._get_client()
         
         try:
-            result = proxmox.nodes(self.node).qemu(vmid).agent.exec.post(
+            result = await self._call(
+                proxmox.nodes(self.node).qemu(vmid).agent.exec.post,
                 command=command
             )
             
             # Wait for command to complete
             pid = result.get("pid")
             if pid:
-                await asyncio.sleep(1)
-                status = proxmox.nodes(self.node).qemu(vmid).agent("exec-status").get(pid=pid)
+                start = time.time()
+                delay = self.exec_poll_initial
+                while True:
+                    status = await self._call(
+                        proxmox.nodes(self.node).qemu(vmid).agent("exec-status").get, pid=pid
+                    )
+                    if status.get("exited") or time.time() - start >= timeout:
+                        break
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 1.6, self.exec_poll_max)
                 return {
                     "exitcode": status.get("exitcode"),
                     "stdout": status.get("out-data", ""),
@@ -252,35 +593,192 @@ class ProxmoxManager:
             logger.error(f"Failed to exec command in VM {vmid}: {e}")
             raise
     
+    async def read_file(self, vmid: int, path: str) -> str:
+        """Read a file from the VM via guest agent in a single RPC."""
+        proxmox = self._get_client()
+        result = await self._call(
+            proxmox.nodes(self.node).qemu(vmid).agent("file-read").get, file=path
+        )
+        return result.get("content", "")
+    
+    async def _stop_vm(self, vmid: int, force: bool = True):
+        """Stop a VM, waiting on the stop task rather than a fixed sleep."""
+        proxmox = self._get_client()
+        try:
+            upid = await self._call(proxmox.nodes(self.node).qemu(vmid).status.stop.post)
+            await self._wait_for_task(upid, timeout=60)
+        except Exception:
+            if force:
+                try:
+                    upid = await self._call(
+                        proxmox.nodes(self.node).qemu(vmid).status.stop.post, forceStop=1
+                    )
+                    await self._wait_for_task(upid, timeout=30)
+                except Exception:
+                    pass
+    
     async def destroy_vm(self, vmid: int, force: bool = True):
         """Stop and delete a VM."""
         proxmox = self._get_client()
         
         try:
-            # Stop the VM
-            try:
-                proxmox.nodes(self.node).qemu(vmid).status.stop.post()
-                await asyncio.sleep(5)
-            except Exception as e:
-                if force:
-                    try:
-                        proxmox.nodes(self.node).qemu(vmid).status.stop.post(forceStop=1)
-                        await asyncio.sleep(3)
-                    except Exception:
-                        pass
+            await self._stop_vm(vmid, force=force)
             
             # Delete the VM
-            proxmox.nodes(self.node).qemu(vmid).delete()
+            await self._call(proxmox.nodes(self.node).qemu(vmid).delete)
+            self._release_vmid(vmid)
             logger.info(f"Destroyed VM {vmid}")
             
         except Exception as e:
             logger.error(f"Failed to destroy VM {vmid}: {e}")
             raise
     
+    async def get_vm_config(self, vmid: int) -> Optional[Dict]:
+        """Get a VM's config, or None if the VM no longer exists."""
+        proxmox = self._get_client()
+        try:
+            return await self._call(proxmox.nodes(self.node).qemu(vmid).config.get)
+        except Exception as e:
+            if "does not exist" in str(e):
+                return None
+            raise
+    
+    @staticmethod
+    def _split_tags(tags: str) -> List[str]:
+        return re.split(r"[;,\s]+", tags or "")
+    
+    @classmethod
+    def is_task_vm(cls, vm_config: Dict, task_id: str) -> bool:
+        """Whether a VM config still carries the task-<id> tag given at checkout."""
+        return f"task-{task_id}" in cls._split_tags(vm_config.get("tags", ""))
+    
+    async def list_pool_vms(self) -> List[Tuple[int, str]]:
+        """(vmid, owner) of every idle pooled VM on this node.
+        
+        owner is the pool-<owner> tag of the pipeline that pooled the VM, or
+        "" for VMs that carry none.
+        """
+        proxmox = self._get_client()
+        vms = await self._call(proxmox.cluster.resources.get, type="vm")
+        pooled = []
+        for vm in vms:
+            tags = self._split_tags(vm.get("tags", ""))
+            if vm.get("node") != self.node or "pool" not in tags:
+                continue
+            owner = next((t[len("pool-"):] for t in tags if t.startswith("pool-")), "")
+            pooled.append((int(vm["vmid"]), owner))
+        return pooled
+    
     async def get_vm_status(self, vmid: int) -> Dict:
         """Get current VM status."""
         proxmox = self._get_client()
-        return proxmox.nodes(self.node).qemu(vmid).status.current.get()
+        return await self._call(proxmox.nodes(self.node).qemu(vmid).status.current.get)
+
+
+class TaskStore:
+    """Persists task state in Redis so it survives restarts and is shared across workers.
+    
+    Each worker publishes a heartbeat key; active tasks owned by a worker whose
+    heartbeat has expired are reported as orphans so their VMs can be reaped.
+    """
+    
+    PREFIX = "autonomous_coder"
+    HEARTBEAT_TTL = 60  # seconds
+    RECORD_TTL = 7 * 24 * 3600  # keep finished task records for a week
+    ACTIVE_STATUSES = ("pending", "provisioning", "running", "completing")
+    
+    def __init__(self, url: str):
+        self.url = url
+        self.worker_id = uuid.uuid4().hex
+        self._redis = None
+        self._heartbeat: Optional[asyncio.Task] = None
+    
+    def _get_client(self):
+        """Lazy-load Redis client."""
+        if self._redis is None:
+            try:
+                import redis.asyncio as aioredis
+            except ImportError:
+                raise ImportError(
+                    "redis package required. Install with: pip install redis"
+                )
+            self._redis = aioredis.from_url(self.url, decode_responses=True)
+        return self._redis
+    
+    async def start(self):
+        """Register this worker and keep its heartbeat alive."""
+        await self._beat()
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+    
+    async def _beat(self):
+        await self._get_client().set(
+            f"{self.PREFIX}:worker:{self.worker_id}", "1", ex=self.HEARTBEAT_TTL
+        )
+    
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.HEARTBEAT_TTL / 3)
+            try:
+                await self._beat()
+            except Exception as e:
+                logger.warning(f"Failed to refresh worker heartbeat: {e}")
+    
+    async def save(self, task: CodingTask):
+        """Write the task's current state (without its progress log)."""
+        data = task.to_dict(include_log=False)
+        if data.get("result") is not None:
+            data["result"] = json.dumps(data["result"])
+        data["owner"] = self.worker_id
+        await self.update(task.id, **data)
+    
+    async def update(self, task_id: str, **fields):
+        """Update fields of a task record and its active/finished bookkeeping."""
+        key = f"{self.PREFIX}:task:{task_id}"
+        record = {k: "" if v is None else str(v) for k, v in fields.items()}
+        client = self._get_client()
+        try:
+            await client.hset(key, mapping=record)
+            if "status" in record:
+                if record["status"] in self.ACTIVE_STATUSES:
+                    await client.sadd(f"{self.PREFIX}:active", task_id)
+                else:
+                    await client.srem(f"{self.PREFIX}:active", task_id)
+                    await client.expire(key, self.RECORD_TTL)
+        except Exception as e:
+            logger.warning(f"Failed to persist task {task_id}: {e}")
+    
+    async def orphaned_tasks(self) -> List[Dict[str, str]]:
+        """Return active task records whose owning worker is gone."""
+        client = self._get_client()
+        orphans = []
+        for task_id in await client.smembers(f"{self.PREFIX}:active"):
+            record = await client.hgetall(f"{self.PREFIX}:task:{task_id}")
+            if not record:
+                await client.srem(f"{self.PREFIX}:active", task_id)
+                continue
+            owner = record.get("owner", "")
+            if owner and await self.worker_alive(owner):
+                continue
+            orphans.append(record)
+        return orphans
+    
+    async def worker_alive(self, worker_id: str) -> bool:
+        """Whether a worker's heartbeat is still current."""
+        client = self._get_client()
+        return bool(await client.exists(f"{self.PREFIX}:worker:{worker_id}"))
+    
+    async def close(self):
+        """Stop the heartbeat and release the connection."""
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        if self._redis is not None:
+            try:
+                await self._redis.delete(f"{self.PREFIX}:worker:{self.worker_id}")
+                await self._redis.close()
+            except Exception as e:
+                logger.warning(f"Failed to close Redis connection: {e}")
+            self._redis = None
 
 
 class Pipe:
@@ -304,22 +802,80 @@ class Pipe:
             self.MAX_TASK_DURATION = int(os.getenv("MAX_TASK_DURATION", "3600"))  # 1 hour
             self.VM_CORES = int(os.getenv("VM_CORES", "2"))
             self.VM_MEMORY = int(os.getenv("VM_MEMORY", "4096"))
+            # Backoff for Proxmox task / guest-agent polling (seconds)
+            self.POLL_INITIAL_DELAY = float(os.getenv("POLL_INITIAL_DELAY", "0.25"))
+            self.POLL_MAX_DELAY = float(os.getenv("POLL_MAX_DELAY", "10"))
+            self.POLL_GROWTH = float(os.getenv("POLL_GROWTH", "1.5"))
+            # Bounds for the adaptive progress.log polling interval (seconds)
+            self.PROGRESS_POLL_MIN = float(os.getenv("PROGRESS_POLL_MIN", "1"))
+            self.PROGRESS_POLL_MAX = float(os.getenv("PROGRESS_POLL_MAX", "15"))
+            # Bounds for polling guest-agent exec results (seconds)
+            self.EXEC_POLL_INITIAL = float(os.getenv("EXEC_POLL_INITIAL", "0.025"))
+            self.EXEC_POLL_MAX = float(os.getenv("EXEC_POLL_MAX", "1"))
+            # Directory holding Proxmox serial sockets (/var/run/qemu-server);
+            # set only when the pipeline runs on the Proxmox host itself
+            self.PROGRESS_SERIAL_DIR = os.getenv("PROGRESS_SERIAL_DIR", "")
+            # Optional Redis for task state shared across workers/restarts
+            self.REDIS_URL = os.getenv("REDIS_URL", "")
+            # Idle agent VMs kept booted for reuse (0 = clone per task). A used
+            # VM is rolled back to a pre-boot disk snapshot before reuse, which
+            # needs snapshot-capable storage (others are destroyed after use)
+            self.VM_POOL_SIZE = int(os.getenv("VM_POOL_SIZE", "0"))
     
     def __init__(self):
         self.name = "Autonomous Coder"
         self.valves = self.Valves()
         self.tasks: Dict[str, CodingTask] = {}
         self.proxmox: Optional[ProxmoxManager] = None
+        self.store: Optional[TaskStore] = None
+        
+        # Progress poll scheduler: one coroutine polls every watched task
+        self._watches: Dict[str, ProgressWatch] = {}
+        self._poll_heap: List[Tuple[float, str]] = []
+        self._poll_wakeup = asyncio.Event()
+        self._poll_slots = asyncio.Semaphore(MAX_INFLIGHT_POLLS)
+        self._scheduler: Optional[asyncio.Task] = None
+        # In-flight polls, referenced so they are not garbage-collected mid-run
+        self._poll_tasks: set = set()
+        self._pool_filler: Optional[asyncio.Task] = None
         
         # Patterns to detect coding task requests
-        self.task_triggers = [
-            r"\b(implement|create|build|develop|code|write)\b.*\b(feature|function|class|module|api|endpoint)\b",
-            r"\b(add|fix|update|refactor|modify)\b.*\b(code|file|function|bug|issue)\b",
+        task_triggers = [
+            r"\b(?:implement|create|build|develop|code|write)\b.*\b(?:feature|function|class|module|api|endpoint)\b",
+            r"\b(?:add|fix|update|refactor|modify)\b.*\b(?:code|file|function|bug|issue)\b",
             r"\bhttps?://(?:github|gitlab|bitbucket)\.[a-z]+/[\w\-\.]+/[\w\-\.]+",
             r"^/code\s+",
             r"^/implement\s+",
             r"^/build\s+",
         ]
+        # Every trigger needs one of these substrings; a literal-only scan
+        # rejects ordinary chat before the heavier patterns run
+        self._trigger_token_re = re.compile(
+            "implement|create|build|develop|code|write|add|fix|update|refactor|modify"
+            "|github|gitlab|bitbucket",
+            re.IGNORECASE
+        )
+        # Fused into one alternation so the message is scanned in a single pass
+        self._trigger_any = re.compile(
+            "|".join(f"(?:{pattern})" for pattern in task_triggers),
+            re.IGNORECASE
+        )
+        self._repo_host_re = re.compile(r'https?://(?:github|gitlab|bitbucket)\.[a-z]+/')
+        self._action_re = re.compile(
+            r"implement|add|create|fix|update|build|modify|change", re.IGNORECASE
+        )
+        
+        # Patterns for pulling repository info out of a message
+        self._url_re = re.compile(
+            r'(https?://(?:github\.com|gitlab\.com|bitbucket\.org)/[\w\-\.]+/[\w\-\.]+)(?:\.git)?'
+        )
+        self._branch_res = [
+            re.compile(r'branch[:\s]+["\']?([a-zA-Z0-9_\-/]+)["\']?', re.IGNORECASE),
+            re.compile(r'on\s+(?:the\s+)?["\']?([a-zA-Z0-9_\-/]+)["\']?\s+branch', re.IGNORECASE),
+        ]
+        self._strip_url_re = re.compile(r'https?://\S+')
+        self._ts_re = re.compile(r'\[(\d{2}:\d{2}:\d{2})\](.*)')
+        self._task_failed_re = re.compile(r'\[TASK_FAILED\]\s*(.*)')
     
     async def on_startup(self):
         """Initialize pipeline on startup."""
@@ -328,6 +884,10 @@ class Pipe:
         logger.info(f"[{self.name}] Template VMID: {self.valves.AGENT_TEMPLATE_VMID}")
         logger.info(f"[{self.name}] Open WebUI API: {self.valves.OPENWEBUI_API_URL}")
         
+        # Shared task state; its worker id also marks this pipeline's pool VMs
+        if self.valves.REDIS_URL:
+            self.store = TaskStore(self.valves.REDIS_URL)
+        
         # Initialize Proxmox manager
         if self.valves.PROXMOX_PASSWORD:
             self.proxmox = ProxmoxManager(
@@ -335,70 +895,173 @@ class Pipe:
                 user=self.valves.PROXMOX_USER,
                 password=self.valves.PROXMOX_PASSWORD,
                 node=self.valves.PROXMOX_NODE,
-                template_vmid=self.valves.AGENT_TEMPLATE_VMID
+                template_vmid=self.valves.AGENT_TEMPLATE_VMID,
+                poll_initial_delay=self.valves.POLL_INITIAL_DELAY,
+                poll_max_delay=self.valves.POLL_MAX_DELAY,
+                poll_growth=self.valves.POLL_GROWTH,
+                exec_poll_initial=self.valves.EXEC_POLL_INITIAL,
+                exec_poll_max=self.valves.EXEC_POLL_MAX,
+                pool_size=self.valves.VM_POOL_SIZE,
+                pool_owner=self.store.worker_id if self.store else None
+            )
+        
+        self._ensure_scheduler()
+        
+        if self.store:
+            try:
+                await self.store.start()
+                await self._reap_orphaned_tasks()
+            except Exception as e:
+                logger.error(f"[{self.name}] Failed to initialize Redis task store: {e}")
+        
+        if self.proxmox:
+            # Warm up in the background; tasks clone on demand until it fills
+            self._pool_filler = asyncio.create_task(self._start_pool())
+    
+    async def _start_pool(self):
+        """Reap pool VMs leaked by dead pipelines, then fill the warm pool."""
+        try:
+            await self._reap_orphaned_pool_vms()
+        except Exception as e:
+            logger.error(f"[{self.name}] Failed to reap orphaned pool VMs: {e}")
+        if self.valves.VM_POOL_SIZE > 0:
+            await self.proxmox.fill_pool(
+                cores=self.valves.VM_CORES,
+                memory=self.valves.VM_MEMORY,
+                serial_socket=bool(self.valves.PROGRESS_SERIAL_DIR)
+            )
+    
+    async def _reap_orphaned_pool_vms(self):
+        """Destroy idle pool VMs whose pipeline is no longer running.
+        
+        Pool VMs are only drained on a clean shutdown, so a crash leaks them.
+        Without a task store there is no heartbeat to check, and every pool
+        VM but this pipeline's own is treated as leaked.
+        """
+        for vmid, owner in await self.proxmox.list_pool_vms():
+            if owner == self.proxmox.pool_owner:
+                continue
+            if owner and self.store and await self.store.worker_alive(owner):
+                continue
+            try:
+                await self.proxmox.destroy_vm(vmid)
+                logger.info(f"Reaped orphaned pool VM {vmid}")
+            except Exception as e:
+                logger.error(f"Failed to reap pool VM {vmid}: {e}")
+    
+    async def _reap_orphaned_tasks(self):
+        """Destroy VMs left behind by workers that died mid-task.
+        
+        Every orphan is marked failed, even when its VM is gone or cannot be
+        destroyed, so it is not retried on each startup. A VMID whose VM no
+        longer carries the task's tag has been reused and is left alone.
+        """
+        for record in await self.store.orphaned_tasks():
+            task_id = record.get("id", "")
+            vmid = record.get("vmid")
+            error = "Orphaned by pipeline restart"
+            if vmid and self.proxmox:
+                try:
+                    vm_config = await self.proxmox.get_vm_config(int(vmid))
+                    if vm_config is None:
+                        logger.info(f"VM {vmid} of orphaned task {task_id} is already gone")
+                    elif not self.proxmox.is_task_vm(vm_config, task_id):
+                        logger.warning(
+                            f"VM {vmid} no longer belongs to orphaned task {task_id}, leaving it"
+                        )
+                    else:
+                        await self.proxmox.destroy_vm(int(vmid))
+                        logger.info(f"Reaped orphaned VM {vmid} for task {task_id}")
+                    vmid = None
+                except Exception as e:
+                    logger.error(f"Failed to reap VM {vmid} for task {task_id}: {e}")
+                    error += f"; failed to destroy VM {vmid}: {e}"
+            await self.store.update(
+                task_id,
+                status=TaskStatus.FAILED.value,
+                vmid=vmid,
+                error=error
             )
     
+    async def _save_task(self, task: CodingTask):
+        """Persist task state when a shared task store is configured."""
+        if self.store:
+            await self.store.save(task)
+    
     async def on_shutdown(self):
         """Cleanup on shutdown."""
         logger.info(f"[{self.name}] Pipeline shutting down...")
         
-        # Cleanup any running tasks
+        if self._scheduler:
+            self._scheduler.cancel()
+            self._scheduler = None
+        for poll in list(self._poll_tasks):
+            poll.cancel()
+        
+        # Cleanup any running tasks, recording that their VMs are gone so
+        # the VMIDs cannot be mistaken for theirs once reused
         for task_id, task in list(self.tasks.items()):
             if task.vmid and task.status in (TaskStatus.RUNNING, TaskStatus.PROVISIONING):
+                task.status = TaskStatus.FAILED
+                task.error = "Pipeline shut down"
+                task.completed_at = time.time()
                 try:
                     await self.proxmox.destroy_vm(task.vmid)
                     logger.info(f"Cleaned up VM for task {task_id}")
+                    task.vmid = None
                 except Exception as e:
                     logger.error(f"Failed to cleanup VM for task {task_id}: {e}")
+                    task.error += f"; failed to destroy VM {task.vmid}: {e}"
+                await self._save_task(task)
+        
+        if self.proxmox:
+            await self.proxmox.drain_pool()
+            self.proxmox.close()
+        if self.store:
+            await self.store.close()
     
     def _is_coding_task(self, message: str) -> bool:
         """Detect if the message is requesting a coding task."""
-        message_lower = message.lower()
+        # Ordinary chat rarely contains any trigger word; skip the regexes
+        if not self._trigger_token_re.search(message):
+            return False
         
-        for pattern in self.task_triggers:
-            if re.search(pattern, message_lower, re.IGNORECASE):
-                return True
+        if self._trigger_any.search(message):
+            return True
         
         # Check for explicit repository URLs
-        if re.search(r'https?://(?:github|gitlab|bitbucket)\.[a-z]+/', message):
+        if self._repo_host_re.search(message):
             # Must also have some action words
-            action_words = ["implement", "add", "create", "fix", "update", "build", "modify", "change"]
-            if any(word in message_lower for word in action_words):
+            if self._action_re.search(message):
                 return True
         
         return False
     
     def _extract_repo_info(self, message: str) -> Optional[Dict]:
         """Extract repository URL and branch from the message."""
-        # Look for repository URLs
-        url_pattern = r'(https?://(?:github\.com|gitlab\.com|bitbucket\.org)/[\w\-\.]+/[\w\-\.]+)(?:\.git)?'
-        urls = re.findall(url_pattern, message)
+        # Only the first repository URL is used
+        url_match = self._url_re.search(message)
         
-        if not urls:
+        if not url_match:
             return None
         
         # Look for branch mentions
-        branch_patterns = [
-            r'branch[:\s]+["\']?([a-zA-Z0-9_\-/]+)["\']?',
-            r'on\s+(?:the\s+)?["\']?([a-zA-Z0-9_\-/]+)["\']?\s+branch',
-        ]
-        
         branch = "main"
-        for pattern in branch_patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
+        for pattern in self._branch_res:
+            match = pattern.search(message)
             if match:
                 branch = match.group(1)
                 break
         
         return {
-            "url": urls[0],
+            "url": url_match.group(1),
             "branch": branch
         }
     
     def _extract_task_description(self, message: str, repo_url: str) -> str:
         """Extract the task description, removing the repo URL."""
         # Remove the URL from the message to get cleaner task description
-        description = re.sub(r'https?://\S+', '', message).strip()
+        description = self._strip_url_re.sub('', message).strip()
         
         # Remove common prefixes
         prefixes = ["/code", "/implement", "/build", "please", "can you", "could you"]
@@ -408,6 +1071,24 @@ class Pipe:
         
         return description or message
     
+    def _parse_message(self, message: str) -> Optional[Dict]:
+        """Classify a message and, for coding tasks, extract everything needed.
+        
+        Returns None for ordinary chat so the caller can bail out after the
+        trigger scan without touching the repo/branch/description patterns.
+        """
+        if not self._is_coding_task(message):
+            return None
+        
+        repo_info = self._extract_repo_info(message)
+        return {
+            "repo_info": repo_info,
+            "description": (
+                self._extract_task_description(message, repo_info["url"])
+                if repo_info else message
+            )
+        }
+    
     async def pipe(
         self,
         body: dict,
@@ -432,24 +1113,24 @@ class Pipe:
         user_message = messages[-1].get("content", "")
         
         # Check if this is a coding task request
-        if not self._is_coding_task(user_message):
+        parsed = self._parse_message(user_message)
+        if parsed is None:
             # Not a coding task - return None to let Open WebUI handle normally
             return None
         
         # This is a coding task - handle it
-        return self._handle_coding_task(body, user_message, __user__, __event_emitter__)
+        return self._handle_coding_task(body, parsed, __user__, __event_emitter__)
     
     async def _handle_coding_task(
         self,
         body: dict,
-        user_message: str,
+        parsed: Dict,
         user: Optional[dict],
         event_emitter
     ) -> AsyncGenerator[str, None]:
         """Handle a detected coding task request."""
         
-        # Extract repository information
-        repo_info = self._extract_repo_info(user_message)
+        repo_info = parsed["repo_info"]
         
         if not repo_info:
             yield self._format_no_repo_message()
@@ -470,7 +1151,7 @@ Please configure the following environment variables:
         
         # Create task
         task_id = str(uuid.uuid4())[:8]
-        task_description = self._extract_task_description(user_message, repo_info["url"])
+        task_description = parsed["description"]
         model = body.get("model", self.valves.DEFAULT_MODEL)
         
         task = CodingTask(
@@ -482,6 +1163,7 @@ Please configure the following environment variables:
             model=model
         )
         self.tasks[task_id] = task
+        await self._save_task(task)
         
         # Start header
         yield f"""# 🚀 Autonomous Coding Task `{task_id}`
@@ -496,9 +1178,11 @@ Please configure the following environment variables:
 
 """
         
+        vm_info: Optional[Dict] = None
         try:
             # Provision VM
             task.status = TaskStatus.PROVISIONING
+            await self._save_task(task)
             yield "## ⏳ Provisioning Agent VM...\n\n"
             
             vm_info = await self.proxmox.create_agent_vm(
@@ -511,13 +1195,14 @@ Please configure the following environment variables:
                     "model": model  # Use the model selected in Open WebUI
                 },
                 cores=self.valves.VM_CORES,
-                memory=self.valves.VM_MEMORY
+                memory=self.valves.VM_MEMORY,
+                serial_socket=bool(self.valves.PROGRESS_SERIAL_DIR)
             )
             
             task.vmid = vm_info["vmid"]
             task.vm_ip = vm_info["ip_address"]
             task.vm_name = vm_info["name"]
-            task.started_at = datetime.utcnow().isoformat()
+            task.started_at = time.time()
             
             yield f"""✅ **Agent VM Ready**
 - Name: `{vm_info['name']}`
@@ -532,23 +1217,32 @@ Please configure the following environment variables:
             
             # Inject and start the agent
             task.status = TaskStatus.RUNNING
-            await self._inject_and_start_agent(task)
+            await self._save_task(task)
+            # Connect before the agent starts so no early lines are missed
+            serial = await self._open_progress_serial(task)
+            await self._inject_and_start_agent(task, progress_serial=serial is not None)
             
             # Stream progress
-            async for progress in self._stream_agent_progress(task):
+            if serial:
+                stream = self._stream_serial_progress(task, *serial)
+            else:
+                stream = self._stream_agent_progress(task)
+            async for progress in stream:
                 yield progress
             
-            # Get result
-            result = await self._get_task_result(task)
+            # Get result (usually already picked up by the final progress poll)
+            result = task.result or await self._get_task_result(task)
             task.result = result
             task.status = TaskStatus.COMPLETED
-            task.completed_at = datetime.utcnow().isoformat()
+            task.completed_at = time.time()
+            await self._save_task(task)
             
             # Format result
             yield self._format_task_result(task, result)
             
         except asyncio.CancelledError:
             task.status = TaskStatus.CANCELLED
+            await self._save_task(task)
             yield "\n\n⚠️ **Task cancelled**\n"
             raise
             
@@ -556,19 +1250,22 @@ Please configure the following environment variables:
             task.status = TaskStatus.FAILED
             task.error = str(e)
             logger.error(f"Task {task_id} failed: {e}", exc_info=True)
+            await self._save_task(task)
             yield f"\n\n❌ **Task Failed**\n\nError: {str(e)}\n"
             
         finally:
-            # Cleanup VM
+            # Cleanup VM (reset and pooled for reuse when the warm pool is on)
             if task.vmid:
                 yield "\n---\n\n🧹 Cleaning up agent VM...\n"
                 try:
-                    await self.proxmox.destroy_vm(task.vmid)
-                    yield "✅ VM destroyed successfully.\n"
+                    if await self.proxmox.release_agent_vm(vm_info):
+                        yield "✅ VM reset and returned to pool.\n"
+                    else:
+                        yield "✅ VM destroyed successfully.\n"
                 except Exception as e:
                     yield f"⚠️ Failed to cleanup VM: {e}\n"
     
-    async def _inject_and_start_agent(self, task: CodingTask):
+    async def _inject_and_start_agent(self, task: CodingTask, progress_serial: bool = False):
         """Inject task configuration and start the agent in the VM."""
         if not task.vmid:
             raise ValueError("No VMID for task")
@@ -584,13 +1281,31 @@ Please configure the following environment variables:
             "openwebui_api_url": self.valves.OPENWEBUI_API_URL,
             "openwebui_api_key": self.valves.OPENWEBUI_API_KEY
         }
-        config_json = json.dumps(config).replace("'", "'\\''")
+        if progress_serial:
+            # serial1 shows up as the second UART inside the guest
+            config["progress_serial_device"] = "/dev/ttyS1"
+        # Base64 needs no shell escaping and survives any payload bytes
+        payload = base64.b64encode(json.dumps(config).encode("utf-8")).decode("ascii")
         
         # Write config to VM
-        await self.proxmox.exec_command(
-            task.vmid,
-            f"echo '{config_json}' > /opt/agent/task_config.json"
-        )
+        if len(payload) <= CONFIG_CHUNK_SIZE:
+            await self.proxmox.exec_command(
+                task.vmid,
+                f"echo {payload} | base64 -d > /opt/agent/task_config.json"
+            )
+        else:
+            # Stay under the guest-agent command length limit
+            staging = "/opt/agent/task_config.json.b64"
+            for i in range(0, len(payload), CONFIG_CHUNK_SIZE):
+                redirect = ">" if i == 0 else ">>"
+                await self.proxmox.exec_command(
+                    task.vmid,
+                    f"echo {payload[i:i + CONFIG_CHUNK_SIZE]} {redirect} {staging}"
+                )
+            await self.proxmox.exec_command(
+                task.vmid,
+                f"base64 -d {staging} > /opt/agent/task_config.json && rm -f {staging}"
+            )
         
         # Start the agent (in background)
         await self.proxmox.exec_command(
@@ -605,60 +1320,270 @@ Please configure the following environment variables:
         if not task.vmid:
             return
         
-        last_line_count = 0
-        check_interval = 3  # seconds
+        watch = ProgressWatch(
+            task=task,
+            queue=asyncio.Queue(),
+            interval=self.valves.PROGRESS_POLL_MIN
+        )
+        max_duration = self.valves.MAX_TASK_DURATION
+        deadline = time.time() + max_duration
+        
+        self._watches[task.id] = watch
+        self._ensure_scheduler()
+        self._schedule_poll(watch, delay=0)
+        
+        try:
+            while True:
+                # Check timeout
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    yield f"\n⏰ **Task timeout** (exceeded {max_duration}s)\n"
+                    break
+                
+                try:
+                    line = await asyncio.wait_for(watch.queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    continue
+                if line is None:
+                    break
+                
+                yield self._format_progress_line(line)
+                task.progress_log.append(line)
+        finally:
+            self._watches.pop(task.id, None)
+    
+    async def _open_progress_serial(
+        self, task: CodingTask
+    ) -> Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
+        """Connect to the VM's serial1 socket, if push progress is available here."""
+        if not self.valves.PROGRESS_SERIAL_DIR or not task.vmid:
+            return None
+        
+        path = os.path.join(self.valves.PROGRESS_SERIAL_DIR, f"{task.vmid}.serial1")
+        if not os.path.exists(path):
+            # Pipeline is not running on the Proxmox host; poll instead
+            return None
+        try:
+            return await asyncio.open_unix_connection(path)
+        except OSError as e:
+            logger.warning(f"Failed to open progress socket {path}, falling back to polling: {e}")
+            return None
+    
+    async def _stream_serial_progress(
+        self,
+        task: CodingTask,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter
+    ) -> AsyncGenerator[str, None]:
+        """Stream progress lines pushed by the agent over the VM's serial port.
+        
+        progress.log is still polled at the slowest interval, as a liveness
+        check and fallback: lines the serial stream missed (e.g. the agent
+        never attached it) are shown from the log, and the stream ends from
+        the log if the agent finished or died while serial stayed silent.
+        Each line is shown once, by whichever source delivers it first.
+        """
         max_duration = self.valves.MAX_TASK_DURATION
-        start_time = time.time()
+        deadline = time.time() + max_duration
+        
+        watch = ProgressWatch(
+            task=task,
+            queue=asyncio.Queue(),
+            interval=self.valves.PROGRESS_POLL_MAX,
+            adaptive=False
+        )
+        self._watches[task.id] = watch
+        self._ensure_scheduler()
+        self._schedule_poll(watch)
+        
+        # Lines shown from one source and not yet seen from the other
+        unmatched = {"serial": Counter(), "log": Counter()}
+        read_next = asyncio.create_task(reader.readline())
+        poll_next = asyncio.create_task(watch.queue.get())
+        
+        try:
+            finished = False
+            while not finished:
+                # Check timeout
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    yield f"\n⏰ **Task timeout** (exceeded {max_duration}s)\n"
+                    break
+                
+                done, _ = await asyncio.wait(
+                    {read_next, poll_next}, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                received = []
+                if read_next in done:
+                    raw = read_next.result()
+                    if not raw:
+                        # Socket closed: the VM went away
+                        break
+                    read_next = asyncio.create_task(reader.readline())
+                    # The guest tty turns "\n" into "\r\n"
+                    line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                    if line.strip():
+                        received.append(("serial", line))
+                if poll_next in done:
+                    line = poll_next.result()
+                    if line is None:
+                        # The log shows the agent finished or exited
+                        yield "\n⚠️ Giving up on serial progress: progress.log shows the agent has stopped\n"
+                        break
+                    poll_next = asyncio.create_task(watch.queue.get())
+                    received.append(("log", line))
+                
+                for source, line in received:
+                    other = unmatched["log" if source == "serial" else "serial"]
+                    if other[line]:
+                        other[line] -= 1
+                        if not other[line]:
+                            del other[line]
+                        continue
+                    unmatched[source][line] += 1
+                    
+                    yield self._format_progress_line(line)
+                    task.progress_log.append(line)
+                    
+                    # Check if task is complete
+                    if "[TASK_COMPLETE]" in line or "[TASK_FAILED]" in line:
+                        error_match = self._task_failed_re.search(line)
+                        if error_match:
+                            task.error = error_match.group(1)
+                        if source == "log":
+                            yield "\n⚠️ Serial progress went silent; finished from progress.log\n"
+                        finished = True
+                        break
+        finally:
+            read_next.cancel()
+            poll_next.cancel()
+            self._watches.pop(task.id, None)
+            writer.close()
+    
+    def _ensure_scheduler(self):
+        """Start the progress poll scheduler if it is not running."""
+        if self._scheduler is None or self._scheduler.done():
+            self._scheduler = asyncio.create_task(self._poll_loop())
+    
+    def _schedule_poll(self, watch: ProgressWatch, delay: Optional[float] = None):
+        """Queue the next progress poll for a watched task."""
+        if delay is None:
+            delay = watch.interval
+        due = asyncio.get_running_loop().time() + delay
+        heapq.heappush(self._poll_heap, (due, watch.task.id))
+        self._poll_wakeup.set()
+    
+    async def _poll_loop(self):
+        """Dispatch progress polls for all watched tasks in due-time order.
         
+        Bounds Proxmox request rate by MAX_INFLIGHT_POLLS no matter how many
+        tasks are streaming.
+        """
+        loop = asyncio.get_running_loop()
         while True:
-            # Check timeout
-            if time.time() - start_time > max_duration:
-                yield f"\n⏰ **Task timeout** (exceeded {max_duration}s)\n"
-                break
+            self._poll_wakeup.clear()
+            if not self._poll_heap:
+                await self._poll_wakeup.wait()
+                continue
+            
+            due, task_id = self._poll_heap[0]
+            delay = due - loop.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._poll_wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
             
+            heapq.heappop(self._poll_heap)
+            watch = self._watches.get(task_id)
+            if watch is None:
+                continue
+            poll = asyncio.create_task(self._poll_progress(watch))
+            self._poll_tasks.add(poll)
+            poll.add_done_callback(self._poll_done)
+    
+    def _poll_done(self, poll: asyncio.Task):
+        """Forget a finished poll, logging anything it raised."""
+        self._poll_tasks.discard(poll)
+        if not poll.cancelled() and poll.exception() is not None:
+            logger.error("Progress poll failed", exc_info=poll.exception())
+    
+    async def _poll_progress(self, watch: ProgressWatch):
+        """Fetch new progress lines for one task and reschedule it."""
+        task = watch.task
+        new_lines = []
+        finished = False
+        
+        async with self._poll_slots:
             try:
-                # Read progress log from VM
+                # Fetch what the agent appended since the last poll, plus
+                # result.json (if written) so completion needs no extra RPC.
+                # The exit status says whether the agent was still running
+                # before the log was read (the [m] keeps pgrep off this shell).
                 result = await self.proxmox.exec_command(
                     task.vmid,
-                    "cat /opt/agent/progress.log 2>/dev/null || echo ''"
+                    "pgrep -f 'python3 [m]ain.py' >/dev/null; alive=$?; "
+                    f"tail -c +{watch.offset + 1} /opt/agent/progress.log 2>/dev/null; "
+                    f"printf '\\n{RESULT_MARKER}\\n'; "
+                    "cat /opt/agent/result.json 2>/dev/null; "
+                    "exit $alive"
                 )
                 
-                log_content = result.get("stdout", "")
-                lines = log_content.strip().split("\n") if log_content.strip() else []
-                
-                # Yield new lines
-                if len(lines) > last_line_count:
-                    for line in lines[last_line_count:]:
-                        if line.strip():
-                            # Format progress line
-                            formatted = self._format_progress_line(line)
-                            yield formatted
-                            task.progress_log.append(line)
-                    last_line_count = len(lines)
+                chunk, sep, result_json = (result.get("stdout", "") or "").rpartition(
+                    f"\n{RESULT_MARKER}\n"
+                )
+                if not sep:
+                    chunk, result_json = result_json, ""
+                # Hold back a trailing partial line until it has been fully written
+                end = chunk.rfind("\n") + 1
+                chunk = chunk[:end]
+                watch.offset += len(chunk.encode("utf-8"))
+                new_lines = [line for line in chunk.split("\n") if line.strip()]
                 
                 # Check if task is complete
-                if "[TASK_COMPLETE]" in log_content:
-                    break
-                if "[TASK_FAILED]" in log_content:
+                if "[TASK_COMPLETE]" in chunk:
+                    finished = True
+                    if result_json.strip():
+                        task.result = json.loads(result_json)
+                elif "[TASK_FAILED]" in chunk:
                     # Extract error
-                    error_match = re.search(r'\[TASK_FAILED\]\s*(.*)', log_content)
+                    error_match = self._task_failed_re.search(chunk)
                     if error_match:
                         task.error = error_match.group(1)
-                    break
+                    finished = True
+                elif result.get("exitcode") == 1:
+                    # Crashed (or was killed) without reporting; the log is complete
+                    task.error = task.error or "Agent process exited without reporting a result"
+                    finished = True
                 
             except Exception as e:
                 logger.warning(f"Failed to read progress for task {task.id}: {e}")
-            
-            await asyncio.sleep(check_interval)
+        
+        for line in new_lines:
+            watch.queue.put_nowait(line)
+        
+        if finished:
+            watch.queue.put_nowait(None)
+            self._watches.pop(task.id, None)
+            return
+        if self._watches.get(task.id) is not watch:
+            # The stream was closed (timeout or cancellation)
+            return
+        
+        # Poll faster while the agent is chatty, back off while it is idle
+        if watch.adaptive:
+            if new_lines:
+                watch.interval = max(self.valves.PROGRESS_POLL_MIN, watch.interval * 0.5)
+            else:
+                watch.interval = min(self.valves.PROGRESS_POLL_MAX, watch.interval * 1.5)
+        self._schedule_poll(watch)
     
     def _format_progress_line(self, line: str) -> str:
         """Format a progress line for display."""
         # Parse timestamp if present
-        timestamp_match = re.match(r'\[(\d{2}:\d{2}:\d{2})\]', line)
-        if timestamp_match:
-            ts = timestamp_match.group(1)
-            content = line[len(timestamp_match.group(0)):].strip()
-            return f"`{ts}` {content}\n"
+        if line.startswith("[") and (timestamp_match := self._ts_re.match(line)):
+            return f"`{timestamp_match.group(1)}` {timestamp_match.group(2).strip()}\n"
         return f"  {line}\n"
     
     async def _get_task_result(self, task: CodingTask) -> Dict:
@@ -667,13 +1592,14 @@ Please configure the following environment variables:
             return {"success": False, "error": "No VM"}
         
         try:
-            result = await self.proxmox.exec_command(
-                task.vmid,
-                "cat /opt/agent/result.json 2>/dev/null || echo '{}'"
-            )
-            
-            result_json = result.get("stdout", "{}")
-            return json.loads(result_json)
+            content = await self.proxmox.read_file(task.vmid, "/opt/agent/result.json")
+        except Exception as e:
+            # No result file means the agent never reached task_complete
+            logger.warning(f"No result for task {task.id}: {e}")
+            return {}
+        
+        try:
+            return json.loads(content or "{}")
         except Exception as e:
             logger.error(f"Failed to get result for task {task.id}: {e}")
             return {"success": False, "error": str(e)}
@@ -117,7 +117,7 @@ chown -R ${AGENT_USER}:${AGENT_USER} ${AGENT_HOME}
 python3 -m venv ${AGENT_DIR}/venv
 source ${AGENT_DIR}/venv/bin/activate
 pip install --upgrade pip
-pip install openai aiohttp requests
+pip install openai aiohttp requests h2 orjson
 
 # Copy agent runtime script (this will be injected by cloud-init in production)
 cat > ${AGENT_DIR}/main.py << 'AGENT_SCRIPT'